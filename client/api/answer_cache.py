@@ -0,0 +1,139 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+import time
+import numpy as np
+from google.genai import types
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    partition: str
+    embedding: np.ndarray
+    messages: list
+    expires_at: float
+
+
+def is_cacheable(reply: list) -> bool:
+    """A reply is reusable if it ends in a text answer and none of its tool calls failed."""
+    if not reply or reply[-1].role != 'model':
+        return False
+    final_parts = reply[-1].parts or []
+    if any(part.function_call for part in final_parts) or not any(part.text for part in final_parts):
+        return False
+    for message in reply:
+        for part in message.parts or []:
+            if part.function_response and "error" in (part.function_response.response or {}):
+                return False
+    return True
+
+
+class SemanticAnswerCache:
+    """
+    Final answers of earlier first-turn queries, looked up by embedding similarity.
+
+    Each answer is stored with its query's normalized embedding under a
+    partition for the tool set it was produced with, so a change to the
+    tools, or a request restricted to other tools, never sees it. A lookup
+    returns the most similar answer in the partition when its cosine
+    similarity reaches `threshold`. Entries expire after `ttl_seconds`, and
+    the least recently used are evicted past `max_entries`.
+    """
+
+    def __init__(
+        self,
+        llm,
+        model: str,
+        threshold: float = 0.95,
+        ttl_seconds: float = 3600,
+        max_entries: int = 1000,
+        dimensions: int = 256,
+    ):
+        self.llm = llm
+        self.model = model
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.dimensions = dimensions
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0, "invalidated": 0}
+        self._entries: OrderedDict[int, CachedAnswer] = OrderedDict()
+        # partition -> (entry ids, stacked embeddings), rebuilt after the partition changes
+        self._index: dict[str, tuple[list[int], np.ndarray]] = {}
+        self._next_id = 0
+
+    @staticmethod
+    def partition(tools_version: Optional[str], tool_names: Optional[list]) -> str:
+        return f"{tools_version}|{','.join(sorted(tool_names)) if tool_names else '*'}"
+
+    async def embed(self, query: str) -> np.ndarray:
+        response = await self.llm.aio.models.embed_content(
+            model=self.model,
+            contents=query,
+            config=types.EmbedContentConfig(
+                task_type="SEMANTIC_SIMILARITY",
+                output_dimensionality=self.dimensions,
+            ),
+        )
+        vector = np.asarray(response.embeddings[0].values, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        self._index.pop(entry.partition, None)
+
+    def _expire(self):
+        now = time.time()
+        expired = [entry_id for entry_id, entry in self._entries.items() if entry.expires_at <= now]
+        for entry_id in expired:
+            self._remove(entry_id)
+        self.stats["expired"] += len(expired)
+
+    def _partition_index(self, partition: str) -> tuple[list[int], Optional[np.ndarray]]:
+        index = self._index.get(partition)
+        if index is None:
+            ids = [entry_id for entry_id, entry in self._entries.items() if entry.partition == partition]
+            matrix = np.stack([self._entries[entry_id].embedding for entry_id in ids]) if ids else None
+            index = (ids, matrix)
+            self._index[partition] = index
+        return index
+
+    def lookup(self, embedding: np.ndarray, partition: str) -> Optional[CachedAnswer]:
+        self._expire()
+        ids, matrix = self._partition_index(partition)
+        if matrix is not None:
+            scores = matrix @ embedding
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                self.stats["hits"] += 1
+                self._entries.move_to_end(ids[best])
+                return self._entries[ids[best]]
+        self.stats["misses"] += 1
+        return None
+
+    def store(self, query: str, embedding: np.ndarray, partition: str, messages: list):
+        """Caches the messages that answered `query`, not including the query itself."""
+        self._entries[self._next_id] = CachedAnswer(
+            query=query,
+            partition=partition,
+            embedding=embedding,
+            messages=[message.model_copy(deep=True) for message in messages],
+            expires_at=time.time() + self.ttl_seconds,
+        )
+        self._next_id += 1
+        self._index.pop(partition, None)
+        self.stats["stores"] += 1
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+
+    def invalidate(self, keep_tools_version: Optional[str] = None):
+        """Drops every answer, or only those produced with a tool list other than `keep_tools_version`."""
+        stale = [
+            entry_id for entry_id, entry in self._entries.items()
+            if keep_tools_version is None or not entry.partition.startswith(f"{keep_tools_version}|")
+        ]
+        for entry_id in stale:
+            self._remove(entry_id)
+        self.stats["invalidated"] += len(stale)
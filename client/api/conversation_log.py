@@ -0,0 +1,176 @@
+from datetime import datetime
+from typing import Optional
+import asyncio
+import gzip
+import json
+import os
+import random
+import time
+
+
+def serialize_conversation(messages: list) -> list:
+    """Converts Gemini Content messages into JSON-serializable dicts."""
+    serializable_conversation = []
+
+    for message in messages:
+        serializable_message = {"role": message.role, "parts": []}
+
+        # Handle both string and list content
+        if isinstance(message.parts, str):
+            serializable_message["parts"] = message.parts
+        elif isinstance(message.parts, list):
+            for content_item in message.parts:
+                if hasattr(content_item, "to_dict"):
+                    serializable_message["parts"].append(content_item.to_dict())
+                elif hasattr(content_item, "model_dump"):
+                    serializable_message["parts"].append(content_item.model_dump(exclude_none=True))
+                else:
+                    serializable_message["parts"].append(content_item)
+
+        serializable_conversation.append(serializable_message)
+
+    return serializable_conversation
+
+
+class _SegmentWriter:
+    """Appends lines to size- and time-rotated JSONL segments. Used from one worker thread."""
+
+    def __init__(self, directory: str, max_bytes: int, rotate_seconds: float, compress: bool):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compress = compress
+        self._file = None
+        self._path = None
+        self._opened_at = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open_segment(self):
+        self.close()
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S_%f")
+        suffix = ".jsonl.gz" if self.compress else ".jsonl"
+        self._path = os.path.join(self.directory, f"conversations_{timestamp}{suffix}")
+        self._file = (
+            gzip.open(self._path, "at", encoding="utf-8") if self.compress else open(self._path, "a", encoding="utf-8")
+        )
+        self._opened_at = time.monotonic()
+
+    def write_batch(self, lines: list):
+        if (
+            self._file is None
+            # Bytes on disk, after encoding and compression
+            or os.path.getsize(self._path) >= self.max_bytes
+            or time.monotonic() - self._opened_at >= self.rotate_seconds
+        ):
+            self._open_segment()
+        data = "".join(lines)
+        self._file.write(data)
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ConversationLogWriter:
+    """
+    Background writer for conversation records.
+
+    `submit` never blocks: records go on a bounded queue and a single task
+    serializes and appends them to rotating JSONL segments in batches, on a
+    worker thread. Once the queue is past `sample_above` full, only a
+    `sample_rate` fraction of new records is kept; when it is completely
+    full, records are dropped and counted.
+    """
+
+    def __init__(
+        self,
+        directory: str = "conversations",
+        max_queue: int = 1000,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        max_bytes: int = 50 * 1024 * 1024,
+        rotate_seconds: float = 3600,
+        compress: bool = False,
+        sample_above: float = 0.8,
+        sample_rate: float = 0.1,
+    ):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_above = sample_above
+        self.sample_rate = sample_rate
+        self.dropped = 0
+        self.sampled_out = 0
+        self._segments = _SegmentWriter(directory, max_bytes, rotate_seconds, compress)
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> "ConversationLogWriter":
+        return cls(
+            directory=os.getenv("CONVERSATION_LOG_DIR") or "conversations",
+            max_queue=int(os.getenv("CONVERSATION_LOG_QUEUE_SIZE", "1000")),
+            batch_size=int(os.getenv("CONVERSATION_LOG_BATCH_SIZE", "50")),
+            flush_interval=float(os.getenv("CONVERSATION_LOG_FLUSH_INTERVAL", "1")),
+            max_bytes=int(os.getenv("CONVERSATION_LOG_MAX_BYTES", str(50 * 1024 * 1024))),
+            rotate_seconds=float(os.getenv("CONVERSATION_LOG_ROTATE_SECONDS", "3600")),
+            compress=os.getenv("CONVERSATION_LOG_COMPRESS", "false").lower() == "true",
+            sample_rate=float(os.getenv("CONVERSATION_LOG_SAMPLE_RATE", "0.1")),
+        )
+
+    def submit(self, record: dict) -> bool:
+        """Queues a record for writing. Returns False if it was dropped."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="conversation-log-writer")
+
+        if self.queue.qsize() >= self.sample_above * self.queue.maxsize and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return False
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout=timeout))
+                except asyncio.TimeoutError:
+                    break
+            # None is the shutdown sentinel queued by close()
+            stopping = None in batch
+            await self._write([record for record in batch if record is not None])
+
+    async def _write(self, batch: list):
+        if not batch:
+            return
+        try:
+            await asyncio.to_thread(self._write_sync, batch)
+        except Exception as e:
+            print(f"❌ Error writing conversation log: {e}")
+
+    def _write_sync(self, batch: list):
+        lines = []
+        for record in batch:
+            record = {**record, "messages": serialize_conversation(record["messages"])}
+            lines.append(json.dumps(record, default=str) + "\n")
+        self._segments.write_batch(lines)
+
+    async def close(self):
+        """Flushes queued records and closes the current segment."""
+        if self._task is not None:
+            await self.queue.put(None)
+            await self._task
+            self._task = None
+        await asyncio.to_thread(self._segments.close)
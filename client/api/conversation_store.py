@@ -0,0 +1,178 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from google.genai import types
+
+
+class ConversationStore(ABC):
+    """
+    Stores the Gemini message history of each conversation by ID.
+
+    Subclasses implement `get`, `save` and `delete`. Histories are lists of
+    `types.Content`; an unknown or expired ID returns an empty history.
+
+    A turn loads the history, extends it and saves it back, so callers hold
+    `turn(conversation_id)` for the whole turn. The lock is per process:
+    with a store shared by several workers, concurrent turns on one
+    conversation in different workers still overwrite each other, and the
+    last one to save wins.
+    """
+
+    def __init__(self):
+        # conversation ID -> [lock, holders and waiters]
+        self._turn_locks: dict[str, list] = {}
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    @asynccontextmanager
+    async def turn(self, conversation_id: str):
+        """Runs turns of one conversation one at a time within this process."""
+        entry = self._turn_locks.setdefault(conversation_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._turn_locks[conversation_id]
+
+    @abstractmethod
+    async def get(self, conversation_id: str) -> list:
+        ...
+
+    @abstractmethod
+    async def save(self, conversation_id: str, messages: list):
+        ...
+
+    @abstractmethod
+    async def delete(self, conversation_id: str):
+        ...
+
+    async def close(self):
+        pass
+
+
+class InMemoryConversationStore(ConversationStore):
+    """Per-process store bounded by conversation count and idle time."""
+
+    def __init__(self, max_conversations: int = 1000, idle_ttl: float = 3600):
+        super().__init__()
+        self.max_conversations = max_conversations
+        self.idle_ttl = idle_ttl
+        self._conversations: OrderedDict[str, tuple[float, list]] = OrderedDict()
+
+    def _evict(self):
+        cutoff = time.time() - self.idle_ttl
+        # Entries are kept in last-used order, so idle ones sit at the front
+        while self._conversations:
+            conversation_id, (last_used, _) = next(iter(self._conversations.items()))
+            if last_used >= cutoff and len(self._conversations) <= self.max_conversations:
+                break
+            self._conversations.pop(conversation_id)
+
+    async def get(self, conversation_id: str) -> list:
+        self._evict()
+        entry = self._conversations.get(conversation_id)
+        if entry is None:
+            return []
+        return list(entry[1])
+
+    async def save(self, conversation_id: str, messages: list):
+        self._conversations[conversation_id] = (time.time(), list(messages))
+        self._conversations.move_to_end(conversation_id)
+        self._evict()
+
+    async def delete(self, conversation_id: str):
+        self._conversations.pop(conversation_id, None)
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    Store backed by a local SQLite file, so several uvicorn workers on one
+    host can serve the same conversation.
+    """
+
+    def __init__(self, path: str, idle_ttl: float = 3600):
+        super().__init__()
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS conversations (
+                id TEXT PRIMARY KEY,
+                messages TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.commit()
+
+    def _get(self, conversation_id: str) -> list:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT messages FROM conversations WHERE id = ? AND updated_at >= ?",
+                (conversation_id, time.time() - self.idle_ttl),
+            ).fetchone()
+        if row is None:
+            return []
+        return [types.Content.model_validate(message) for message in json.loads(row[0])]
+
+    def _save(self, conversation_id: str, messages: list):
+        payload = json.dumps([message.model_dump(mode="json", exclude_none=True) for message in messages])
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO conversations VALUES (?, ?, ?)",
+                (conversation_id, payload, time.time()),
+            )
+            self._db.execute(
+                "DELETE FROM conversations WHERE updated_at < ?", (time.time() - self.idle_ttl,)
+            )
+            self._db.commit()
+
+    def _delete(self, conversation_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+            self._db.commit()
+
+    async def get(self, conversation_id: str) -> list:
+        return await asyncio.to_thread(self._get, conversation_id)
+
+    async def save(self, conversation_id: str, messages: list):
+        await asyncio.to_thread(self._save, conversation_id, messages)
+
+    async def delete(self, conversation_id: str):
+        await asyncio.to_thread(self._delete, conversation_id)
+
+    async def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def create_conversation_store() -> ConversationStore:
+    """Builds the store selected by the CONVERSATION_STORE environment variable."""
+    backend = os.getenv("CONVERSATION_STORE", "memory").lower()
+    idle_ttl = float(os.getenv("CONVERSATION_IDLE_TTL", "3600"))
+    if backend == "sqlite":
+        return SQLiteConversationStore(
+            os.getenv("CONVERSATION_DB_PATH") or "conversations.sqlite3", idle_ttl=idle_ttl
+        )
+    if backend == "memory":
+        return InMemoryConversationStore(
+            max_conversations=int(os.getenv("CONVERSATION_MAX_COUNT", "1000")), idle_ttl=idle_ttl
+        )
+    raise ValueError(f"Unknown CONVERSATION_STORE backend: {backend}")
@@ -0,0 +1,130 @@
+from collections import OrderedDict
+from typing import Optional
+import hashlib
+import json
+import time
+from google.genai import types
+
+
+def estimate_tokens(messages: list) -> int:
+    """Rough token count (about four characters per token) of a message list."""
+    return sum(len(message.model_dump_json(exclude_none=True)) for message in messages) // 4
+
+
+def _to_json(value):
+    # MCP content blocks are pydantic models; send their fields, not their repr
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    return str(value)
+
+
+def _compact_response(response: dict, max_chars: int) -> dict:
+    text = json.dumps(response, default=_to_json, ensure_ascii=False)
+    if len(text) <= max_chars:
+        return response
+    return {"result": text[:max_chars] + " …[older tool result compacted]"}
+
+
+def compact_history(messages: list, token_budget: int, max_chars: int) -> list:
+    """
+    Truncates older tool results once the history exceeds `token_budget`.
+
+    Tool results are compacted oldest first, and the most recent tool message
+    is always kept whole. The input list and its messages are not modified.
+
+    Args:
+        messages (list): Conversation history as Gemini Content objects.
+        token_budget (int): Estimated token count above which to compact.
+        max_chars (int): Size each compacted tool result is cut down to.
+
+    Returns:
+        list: The history, with older tool results shortened as needed.
+    """
+    total = estimate_tokens(messages)
+    if total <= token_budget:
+        return messages
+
+    tool_indexes = [index for index, message in enumerate(messages) if message.role == 'tool']
+    compacted = list(messages)
+    for index in tool_indexes[:-1]:
+        message = compacted[index]
+        before = estimate_tokens([message])
+        parts = [
+            types.Part.from_function_response(
+                name=part.function_response.name,
+                response=_compact_response(part.function_response.response, max_chars),
+            )
+            if part.function_response else part
+            for part in message.parts or []
+        ]
+        compacted[index] = types.Content(role=message.role, parts=parts)
+        total -= before - estimate_tokens([compacted[index]])
+        if total <= token_budget:
+            break
+    return compacted
+
+
+class ContextCache:
+    """
+    Explicit Gemini context caches for stable conversation prefixes.
+
+    A prefix (tool declarations plus earlier turns) is cached once and
+    reused by every step of the agent loop until it expires, so only the
+    new messages are sent with each request. Prefixes smaller than
+    `min_tokens` are not worth caching and are skipped.
+    """
+
+    def __init__(self, llm, model: str, ttl_seconds: int = 300, min_tokens: int = 4096, max_entries: int = 128):
+        self.llm = llm
+        self.model = model
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _key(self, prefix: list, tools_version: Optional[str], tool_names: Optional[frozenset]) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{self.model}|{tools_version}|{sorted(tool_names or [])}".encode("utf-8"))
+        for message in prefix:
+            digest.update(message.model_dump_json(exclude_none=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    async def get(self, prefix: list, tools: list, tools_version: Optional[str], tool_names: Optional[frozenset]) -> Optional[str]:
+        """Returns the name of a cache holding `prefix`, creating one if needed."""
+        if not prefix or estimate_tokens(prefix) < self.min_tokens:
+            return None
+
+        key = self._key(prefix, tools_version, tool_names)
+        entry = self._entries.get(key)
+        # Leave a margin so a cache does not expire mid-request
+        if entry is not None and entry[1] - 30 > time.time():
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[0]
+
+        self.stats["misses"] += 1
+
+        cache = await self.llm.aio.caches.create(
+            model=self.model,
+            config=types.CreateCachedContentConfig(
+                contents=prefix,
+                tools=tools or None,
+                ttl=f"{self.ttl_seconds}s",
+            ),
+        )
+        self._entries[key] = (cache.name, time.time() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return cache.name
+
+
+def usage_from_response(response) -> dict:
+    """Token counts reported by Gemini for one call."""
+    usage = getattr(response, "usage_metadata", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_token_count", None) or 0,
+        "cached_tokens": getattr(usage, "cached_content_token_count", None) or 0,
+        "output_tokens": getattr(usage, "candidates_token_count", None) or 0,
+    }
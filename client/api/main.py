@@ -1,23 +1,43 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from contextlib import asynccontextmanager
 from mcp_client import MCPClient
+from telemetry import metrics, REQUEST_LATENCY
+from logger import log_context
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
+import json
 import os
+import sys
+import time
+import uuid
 
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'), override=True)
 
 class Settings(BaseSettings):
-    mcp_server_config_path: str = os.getenv("MCP_SERVERS_CONFIG_PATH", None)
+    mcp_server_config_path: Optional[str] = os.getenv("MCP_SERVERS_CONFIG_PATH")
 
 settings = Settings()
 
+def create_llm():
+    """Scripted fake Gemini when FAKE_GEMINI_SCRIPT is set (load testing), otherwise the real client."""
+    script_path = os.getenv("FAKE_GEMINI_SCRIPT")
+    if not script_path:
+        return None
+    # The fake ships with the load-test tools, not with the API
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'loadtest'))
+    from fake_gemini import FakeGeminiClient
+
+    print(f"⚠️  Using fake Gemini backend scripted by {script_path}")
+    return FakeGeminiClient.from_file(script_path)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    client = MCPClient()
+    client = MCPClient(llm=create_llm())
     try:
         connected = await client.connect_to_server(settings.mcp_server_config_path)
         if not connected:
@@ -35,6 +55,36 @@ async def lifespan(app: FastAPI):
 app = FastAPI(title="MCP Client API", lifespan=lifespan)
 
 
+def collect_client_metrics():
+    client = getattr(app.state, "client", None)
+    return client.metric_families() if client is not None else []
+
+
+metrics.add_collector(collect_client_metrics)
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    # Streamed responses are timed to their first byte, not to the end of the stream
+    start = time.perf_counter()
+    status = 500
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    try:
+        with log_context(request_id=request_id):
+            response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            path=route.path if route is not None else "unmatched",
+            status=str(status),
+        )
+
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -47,6 +97,8 @@ app.add_middleware(
 
 class QueryRequest(BaseModel):
     query: str
+    conversation_id: Optional[str] = None
+    tools: Optional[List[str]] = None
 
 
 class Message(BaseModel):
@@ -60,15 +112,47 @@ class ToolCall(BaseModel):
 
 
 @app.post("/query")
-async def process_query(request: QueryRequest):
-    """Process a query and return the response"""
+async def process_query(request: QueryRequest, http_request: Request):
+    """
+    Process a query and return the response.
+
+    Queries on one conversation_id run one at a time per worker. Across
+    workers sharing a store, the turn saved last wins.
+    """
     try:
-        messages = await app.state.client.process_query(request.query)
-        return {"messages": messages}
+        client = app.state.client
+        conversation_id = request.conversation_id or client.conversations.new_id()
+        messages = await client.process_query(
+            request.query, conversation_id, request.tools, traceparent=http_request.headers.get("traceparent")
+        )
+        return {"conversation_id": conversation_id, "messages": messages}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/query/stream")
+async def process_query_stream(request: QueryRequest, http_request: Request):
+    """
+    Process a query, streaming model text and tool events as server-sent events.
+
+    Queries on one conversation_id run one at a time per worker, as for /query.
+    """
+    client = app.state.client
+    conversation_id = request.conversation_id or client.conversations.new_id()
+    traceparent = http_request.headers.get("traceparent")
+
+    async def event_stream():
+        try:
+            async for event in client.process_query_stream(
+                request.query, conversation_id, request.tools, traceparent=traceparent
+            ):
+                yield f"data: {json.dumps(jsonable_encoder(event))}\n\n"
+        except Exception as e:
+            yield f"data: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @app.get("/tools")
 async def get_tools():
     """Get the list of available tools"""
@@ -88,6 +172,15 @@ async def get_tools():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics for this worker process and the MCP servers' caches"""
+    client = getattr(app.state, "client", None)
+    if client is not None:
+        await client.collect_server_stats()
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
 
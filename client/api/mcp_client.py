@@ -1,27 +1,39 @@
-from typing import Optional, List
-from contextlib import AsyncExitStack
+from typing import Optional, List, Dict
 import traceback
 from dotenv import load_dotenv
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from mcp import ClientSession
+from mcp import types as mcp_types
+from mcp.shared.exceptions import McpError
 from datetime import datetime
+import asyncio
+import hashlib
 import json
 import os
 import sys
+import time
 import google.genai as genai
 from google.genai import types
 from google.genai.types import Tool, FunctionDeclaration
+from conversation_store import ConversationStore, create_conversation_store
+from server_connection import ServerPool
+from conversation_log import ConversationLogWriter
+from llm_context import ContextCache, compact_history, estimate_tokens, usage_from_response
+from answer_cache import SemanticAnswerCache, is_cacheable
+from singleflight import SingleFlight
+from telemetry import LLM_LATENCY, LLM_TOKENS, TOOL_LATENCY, AGENT_STEPS
+from tracing import Tracer
+
+# Loaded before the logger, which reads its settings at import time
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'), override=True)
 
 utils_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils'))
 sys.path.append(utils_path)
 
 try:
-    from logger import logger
+    from logger import logger, log_context
 except ImportError as e:
     print("ImportError:", e)
 
-load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'), override=True)
-
 def read_config_json(config_path: str):
 
         if not config_path:
@@ -37,21 +49,63 @@ def read_config_json(config_path: str):
             sys.exit(1)
 
 class MCPClient:
-    def __init__(self):
-        self.sessions: Optional[List[ClientSession]] = []
-        self.exit_stack = AsyncExitStack()
-        gemini_api_key = os.getenv("GEMINI_API_KEY")
-        if not gemini_api_key:
-            raise ValueError("GEMINI_API_KEY not found. Please add it to your .env file.")
-        self.llm = genai.Client(api_key=gemini_api_key)
+    def __init__(self, conversations: Optional[ConversationStore] = None, llm=None):
+        if llm is None:
+            gemini_api_key = os.getenv("GEMINI_API_KEY")
+            if not gemini_api_key:
+                raise ValueError("GEMINI_API_KEY not found. Please add it to your .env file.")
+            llm = genai.Client(api_key=gemini_api_key)
+        self.llm = llm
+        self.model = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-lite")
+        self.history_token_budget = int(os.getenv("HISTORY_TOKEN_BUDGET", "32000"))
+        self.compacted_tool_result_chars = int(os.getenv("COMPACTED_TOOL_RESULT_CHARS", "2000"))
+        self.context_cache = None
+        if os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true":
+            self.context_cache = ContextCache(
+                self.llm,
+                self.model,
+                ttl_seconds=int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "300")),
+                min_tokens=int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "4096")),
+            )
+        self.answer_cache = None
+        if os.getenv("ANSWER_CACHE", "false").lower() == "true":
+            self.answer_cache = SemanticAnswerCache(
+                self.llm,
+                os.getenv("ANSWER_CACHE_EMBEDDING_MODEL", "text-embedding-004"),
+                threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+                ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+                max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+            )
         self.tools = []
-        self.messages = []
+        self.tools_version = None
+        self._llm_configs = {}
+        self.max_steps = int(os.getenv("MAX_AGENT_STEPS", "8"))
+        self.tool_timeout = float(os.getenv("TOOL_CALL_TIMEOUT", "60"))
+        self.coalesce_tool_calls = os.getenv("TOOL_CALL_COALESCING", "true").lower() == "true"
+        self.inflight_tool_calls = SingleFlight()
+        self.conversations = conversations or create_conversation_store()
         self.message_logs=[]
+        self.conversation_log = ConversationLogWriter.from_env()
+        self.tracer = Tracer.from_env("mcp-client")
         self.logger = logger
-        self.sessions = []
-        self.stdios = []
-        self.writes = []
-
+        self.connections: Dict[str, ServerPool] = {}
+        self.server_start_timeout = float(os.getenv("MCP_SERVER_START_TIMEOUT", "60"))
+        self.tools_cache_path = os.getenv("MCP_TOOLS_CACHE_PATH") or "mcp_tools_cache.json"
+        self.server_tools: Dict[str, list] = {}
+        self.mcp_tools = []
+        self.tool_routes: Dict[str, str] = {}
+        self.tool_collisions: Dict[str, List[str]] = {}
+        self._background_tasks = set()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._refresh_again = False
+        # Latest cache://stats of each server replica, read when metrics are scraped
+        self.server_stats: Dict[tuple, dict] = {}
+        self._servers_without_stats = set()
+
+
+    @property
+    def sessions(self) -> List[ClientSession]:
+        return [connection.session for connection in self.connections.values() if connection.connected]
 
     async def connect_to_server(self, mcp_servers_config_path: str):
         try:
@@ -61,34 +115,42 @@ class MCPClient:
                  print("❌ No MCP servers found in the configuration.")
                  return False
 
+            cached_tools = self.load_tools_cache()
+            pending = []
             for server_name, server_info in mcp_servers.items():
-                print(f"\n🔗 Connecting to MCP Server: {server_name}...")
-
-                server_params = StdioServerParameters(
-                    command=server_info["command"],
-                    args=server_info["args"]
-                )
-
-                stdio_transport = await self.exit_stack.enter_async_context(
-                    stdio_client(server_params)
-                )
-                self.stdio, self.write = stdio_transport
-                session = await self.exit_stack.enter_async_context(
-                    ClientSession(self.stdio, self.write)
+                connection = ServerPool(
+                    server_name,
+                    server_info,
+                    message_handler=self._make_message_handler(server_name),
+                    start_timeout=self.server_start_timeout,
+                    # Covers late and lazy starts and restarts, not only the first attempt
+                    on_ready=lambda replica: self.schedule_tool_refresh(),
                 )
+                self.connections[server_name] = connection
 
-                self.sessions.append(session)
-
-                await self.sessions[-1].initialize()
+                # Lazy servers with known tools are only spawned on first use
+                if connection.lazy and server_name in cached_tools:
+                    self.server_tools[server_name] = cached_tools[server_name]
+                    print(f"\n💤 Deferring MCP Server until first use: {server_name}")
+                    continue
 
-                self.logger.info(f"Connected to MCP server: {server_name}")
+                print(f"\n🔗 Connecting to MCP Server: {server_name}...")
+                connection.start()
+                pending.append(asyncio.create_task(self._wait_for_server(connection)))
 
-            mcp_tools = await self.get_mcp_tools()
+            # Serve as soon as one server is up; the rest are added as they connect
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if any(task.result() for task in done):
+                    break
+            if pending:
+                self._run_in_background(self._connect_remaining(pending))
 
-            for tool in mcp_tools:
-                self.tools.append(tool)
+            if not any(connection.connected for connection in self.connections.values()) and not self.server_tools:
+                print("❌ Could not connect to any MCP server.")
+                return False
 
-            self.tools = convert_mcp_tools_to_gemini(self.tools)
+            await self.refresh_tool_routes()
 
             tools = [
                     {
@@ -112,110 +174,534 @@ class MCPClient:
 
     # get mcp tool list
     async def get_mcp_tools(self):
+        return self.mcp_tools
+
+    # wait for one server to finish starting, reporting the outcome
+    async def _wait_for_server(self, connection: ServerPool) -> bool:
+        if await connection.wait_ready():
+            self.logger.info(f"Connected to MCP server: {connection.name}")
+            return True
+        self.logger.error(f"Failed to connect to MCP server {connection.name}: {connection.error}")
+        return False
+
+    async def _connect_remaining(self, pending):
+        # Routes are refreshed by each server's on_ready callback; this only reports the outcomes
+        await asyncio.gather(*pending)
+
+    def schedule_tool_refresh(self):
+        """Refreshes tool routes in the background; requests made while one runs are folded into one more run."""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_again = True
+            return
+        self._refresh_task = self._run_in_background(self._refresh_tools())
+
+    async def _refresh_tools(self):
+        while True:
+            self._refresh_again = False
+            try:
+                await self.refresh_tool_routes()
+            except Exception:
+                # Already logged; the next server event tries again
+                pass
+            if not self._refresh_again:
+                return
+
+    def _run_in_background(self, coro):
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    def load_tools_cache(self) -> Dict[str, list]:
+        if not os.path.exists(self.tools_cache_path):
+            return {}
         try:
-            all_tools = []
-            for _, session in enumerate(self.sessions):
-                try:
-                    response = await session.list_tools()
-                    all_tools.extend(response.tools)
-                except Exception as e:
-                    self.logger.error(f"Error getting tools from session: {e}")
+            with open(self.tools_cache_path, "r") as f:
+                cached = json.load(f)
+            return {
+                server_name: [mcp_types.Tool.model_validate(tool) for tool in tools]
+                for server_name, tools in cached.items()
+            }
+        except Exception as e:
+            self.logger.error(f"Error reading MCP tools cache: {e}")
+            return {}
+
+    def save_tools_cache(self):
+        try:
+            with open(self.tools_cache_path, "w") as f:
+                json.dump(
+                    {
+                        server_name: [tool.model_dump(mode="json", exclude_none=True) for tool in tools]
+                        for server_name, tools in self.server_tools.items()
+                    },
+                    f,
+                )
+        except Exception as e:
+            self.logger.error(f"Error writing MCP tools cache: {e}")
+
+    # rebuild the tool name -> server routing table from every connected server
+    async def refresh_tool_routes(self):
+        try:
+            connected = [connection for connection in self.connections.values() if connection.connected]
+            responses = await asyncio.gather(
+                *(connection.session.list_tools() for connection in connected), return_exceptions=True
+            )
+            for connection, response in zip(connected, responses):
+                if isinstance(response, Exception):
+                    self.logger.error(f"Error getting tools from session {connection.name}: {response}")
                     continue
+                self.server_tools[connection.name] = response.tools
+            self.save_tools_cache()
+
+            routes = {}
+            collisions = {}
+            all_tools = []
+            # Walk servers in config order so routing does not depend on startup timing
+            for server_name in self.connections:
+                for tool in self.server_tools.get(server_name, []):
+                    if tool.name in routes:
+                        # First server to register a name keeps it
+                        collisions.setdefault(tool.name, [routes[tool.name]]).append(server_name)
+                        continue
+                    routes[tool.name] = server_name
+                    all_tools.append(tool)
+
+            for tool_name, server_names in collisions.items():
+                self.logger.warning(
+                    f"Tool name collision: '{tool_name}' is provided by {server_names}; routing to {server_names[0]}"
+                )
+
+            self.tool_routes = routes
+            self.tool_collisions = collisions
+            self.mcp_tools = all_tools
+            version = tools_fingerprint(all_tools)
+            if version != self.tools_version:
+                self.tools = convert_mcp_tools_to_gemini(all_tools)
+                self.tools_version = version
+                self._llm_configs = {}
+                if self.answer_cache is not None:
+                    # Answers produced with the old tool list may no longer hold
+                    self.answer_cache.invalidate(keep_tools_version=version)
+                self.logger.info(f"Gemini tool declarations rebuilt (version {version})")
             return all_tools
         except Exception as e:
             self.logger.error(f"Error getting MCP tools: {e}")
             raise
 
+    def _make_message_handler(self, server_name: str):
+        async def handle_message(message):
+            if isinstance(message, mcp_types.ServerNotification) and isinstance(
+                message.root, mcp_types.ToolListChangedNotification
+            ):
+                self.logger.info(f"Tool list changed on MCP server: {server_name}")
+                # The handler runs on the session's receive loop, which must stay
+                # free to deliver the list_tools responses, so refresh in a task.
+                self.schedule_tool_refresh()
+
+        return handle_message
+
     # process user query
-    async def process_query(self, query: str):
+    async def process_query(
+        self, query: str, conversation_id: str, tool_names: Optional[List[str]] = None, traceparent: Optional[str] = None
+    ):
+        with log_context(conversation_id=conversation_id), self.tracer.span(
+            "process_query", {"conversation.id": conversation_id, "stream": False}, traceparent=traceparent, kind="SERVER"
+        ) as span:
+            async with self.conversations.turn(conversation_id):
+                messages = await self._process_query(query, conversation_id, tool_names, span)
+        return messages
+
+    async def _process_query(self, query: str, conversation_id: str, tool_names: Optional[List[str]], span):
         try:
             self.logger.info(f"Processing query: {query}")
             user_message = types.Content(
                 role='user',
                 parts=[types.Part.from_text(text=query)]
             )
-            self.messages=[user_message]
-            final_text = []
-
-            while True:
-                response = await self.call_llm()
-                for candidate in response.candidates:
-                    if candidate.content.parts:
-                        for part in candidate.content.parts:
-                             if isinstance(part, types.Part): # Check if part is a valid Gemini response unit
-                                 if part.function_call:  # If Gemini suggests a function call, process it
-                                    # Extract function call details
-                                    function_call_part = part
-                                    tool_name = function_call_part.function_call.name
-                                    tool_args = function_call_part.function_call.args
-                                    self.messages.append(candidate.content)
-
-                                    print(f"\n[Gemini requested tool call: {tool_name} with args {tool_args}]")
-
-                                    # Execute the tool using the MCP server
-                                    result = None
-                                    error = None
-                                    for session in self.sessions:
-                                        try:
-                                            result = await session.call_tool(tool_name, tool_args)
-                                            if result:
-                                                break
-                                        except Exception as e:
-                                            error = e
-                                            continue
-
-                                    if result:
-                                        function_response = {"result": result.content}
-                                    else:
-                                        function_response = {"error": f"Tool {tool_name} not found in any session or failed: {error}"}
-
-                                    # Format the tool response for Gemini in a way it understands
-                                    function_response_part = types.Part.from_function_response(
-                                        name=tool_name,
-                                        response=function_response
-                                    )
-
-                                    # Structure the tool response as a Content object for Gemini
-                                    function_response_content = types.Content(
-                                        role='tool',
-                                        parts=[function_response_part]
-                                    )
-
-                                    self.messages.append(function_response_content)
-
-                                    # Send tool execution results back to Gemini for processing
-                                    response = await self.call_llm()
-
-                                    # Extract final response text from Gemini after processing the tool call
-                                    final_text.append(response.candidates[0].content.parts[0].text)
-                                    self.messages.append(response.candidates[0].content)
-                                 else:
-                                     self.messages.append(response.candidates[0].content)
-                    else:
-                        self.messages.append(response.candidates[0].content)
-                        final_text.append(part.text)
-                        break
-
-                await self.log_conversation()
-
-                return self.messages
+            messages = await self.conversations.get(conversation_id)
+            # Earlier turns do not change while this query runs, so they can be cached
+            history_length = len(messages)
+            cached, cache_key = await self.lookup_answer(query, messages, tool_names)
+            messages.append(user_message)
+            usage = []
+
+            span.set_attribute("answer_cache.hit", cached is not None)
+            if cached is not None:
+                messages.extend(cached)
+                await self.conversations.save(conversation_id, messages)
+                await self.log_conversation(messages, conversation_id, usage)
+                return messages
+
+            stopped = False
+            for _ in range(self.max_steps):
+                response = await self.call_llm(messages, tool_names, history_length)
+                usage.append(usage_from_response(response))
+                if not response.candidates or not response.candidates[0].content:
+                    break
+
+                model_content = response.candidates[0].content
+                messages.append(model_content)
+
+                # Gemini may request several tools in one turn; run them together
+                function_calls = [part for part in model_content.parts or [] if part.function_call]
+                if not function_calls:
+                    break
+
+                for part in function_calls:
+                    self.logger.debug("Gemini requested tool call: %s with args %s", part.function_call.name, part.function_call.args)
+
+                # Send all tool results back to Gemini in a single message
+                messages.append(await self.run_function_calls(function_calls))
+            else:
+                messages.append(self.max_steps_message())
+                stopped = True
+
+            if not stopped:
+                self.store_answer(query, cache_key, messages[history_length + 1:])
+            self.record_steps(span, usage, stopped, stream=False)
+            await self.conversations.save(conversation_id, messages)
+            await self.log_conversation(messages, conversation_id, usage)
+
+            return messages
 
         except Exception as e:
             self.logger.error(f"Error processing query: {e}")
             raise
 
-    # call llm
-    async def call_llm(self):
+    # process user query, yielding model text and tool events as they happen
+    async def process_query_stream(
+        self, query: str, conversation_id: str, tool_names: Optional[List[str]] = None, traceparent: Optional[str] = None
+    ):
+        with log_context(conversation_id=conversation_id), self.tracer.span(
+            "process_query", {"conversation.id": conversation_id, "stream": True}, traceparent=traceparent, kind="SERVER"
+        ) as span:
+            async with self.conversations.turn(conversation_id):
+                async for event in self._process_query_stream(query, conversation_id, tool_names, span):
+                    yield event
+
+    async def _process_query_stream(self, query: str, conversation_id: str, tool_names: Optional[List[str]], span):
+        try:
+            self.logger.info(f"Processing streamed query: {query}")
+            user_message = types.Content(
+                role='user',
+                parts=[types.Part.from_text(text=query)]
+            )
+            messages = await self.conversations.get(conversation_id)
+            history_length = len(messages)
+            cached, cache_key = await self.lookup_answer(query, messages, tool_names)
+            messages.append(user_message)
+            usage = []
+
+            span.set_attribute("answer_cache.hit", cached is not None)
+            if cached is not None:
+                messages.extend(cached)
+                answer = "".join(part.text or "" for part in cached[-1].parts or [])
+                yield {"type": "text", "text": answer}
+                await self.conversations.save(conversation_id, messages)
+                await self.log_conversation(messages, conversation_id, usage)
+                yield {"type": "done", "conversation_id": conversation_id, "messages": messages, "usage": usage, "cached": True}
+                return
+
+            stopped = False
+            for _ in range(self.max_steps):
+                text = []
+                function_calls = []
+                last_chunk = None
+                # Timed here rather than in call_llm_stream, which returns before the stream is read
+                start = time.perf_counter()
+                outcome = "error"
+                with self.tracer.span("call_llm", {"llm.model": self.model, "llm.stream": True}, kind="CLIENT") as llm_span:
+                    try:
+                        async for chunk in await self.call_llm_stream(messages, tool_names, history_length):
+                            if last_chunk is None:
+                                llm_span.set_attribute("llm.first_chunk_ms", round((time.perf_counter() - start) * 1000, 1))
+                            last_chunk = chunk
+                            if not chunk.candidates or not chunk.candidates[0].content or not chunk.candidates[0].content.parts:
+                                continue
+                            for part in chunk.candidates[0].content.parts:
+                                if part.function_call:
+                                    function_calls.append(part)
+                                elif part.text:
+                                    text.append(part.text)
+                                    yield {"type": "text", "text": part.text}
+                        outcome = "ok"
+                    finally:
+                        LLM_LATENCY.observe(time.perf_counter() - start, model=self.model, stream="true", outcome=outcome)
+
+                    # The final chunk carries the usage totals for the call
+                    usage.append(usage_from_response(last_chunk))
+                    self.record_llm_usage(llm_span, usage[-1])
+
+                # Merge streamed text into a single part so the history matches process_query
+                parts = [types.Part.from_text(text="".join(text))] if text else []
+                messages.append(types.Content(role='model', parts=parts + function_calls))
+
+                if not function_calls:
+                    break
+
+                for part in function_calls:
+                    yield {"type": "tool_call", "name": part.function_call.name, "args": part.function_call.args}
+
+                function_response_content = await self.run_function_calls(function_calls)
+                messages.append(function_response_content)
+                for part in function_response_content.parts:
+                    yield {
+                        "type": "tool_result",
+                        "name": part.function_response.name,
+                        "response": part.function_response.response,
+                    }
+            else:
+                messages.append(self.max_steps_message())
+                stopped = True
+
+            if not stopped:
+                self.store_answer(query, cache_key, messages[history_length + 1:])
+            self.record_steps(span, usage, stopped, stream=True)
+            await self.conversations.save(conversation_id, messages)
+            await self.log_conversation(messages, conversation_id, usage)
+
+            yield {"type": "done", "conversation_id": conversation_id, "messages": messages, "usage": usage}
+
+        except Exception as e:
+            self.logger.error(f"Error processing streamed query: {e}")
+            raise
+
+    # look up a cached answer to a conversation's first query
+    async def lookup_answer(self, query: str, history: list, tool_names: Optional[List[str]]):
+        """
+        Returns (cached reply messages or None, cache key). Follow-up
+        questions depend on earlier turns, so only first turns use the cache.
+        """
+        if self.answer_cache is None or history:
+            return None, None
         try:
-            self.logger.info("Calling LLM")
-            return self.llm.models.generate_content(
-                    model="gemini-2.0-flash-lite",
-                    contents=self.messages,
-                    config=types.GenerateContentConfig(
+            embedding = await self.answer_cache.embed(query)
+        except Exception as e:
+            self.logger.warning(f"Answer cache lookup skipped, embedding failed: {e}")
+            return None, None
+        partition = SemanticAnswerCache.partition(self.tools_version, tool_names)
+        entry = self.answer_cache.lookup(embedding, partition)
+        if entry is not None:
+            self.logger.info(f"Answer cache hit for query: {query} (cached query: {entry.query})")
+            return list(entry.messages), None
+        return None, (embedding, partition)
+
+    def store_answer(self, query: str, cache_key, reply: list):
+        if cache_key is not None and is_cacheable(reply):
+            self.answer_cache.store(query, *cache_key, reply)
+
+    def record_steps(self, span, usage: list, stopped: bool, stream: bool):
+        AGENT_STEPS.observe(len(usage), stream=str(stream).lower())
+        span.set_attribute("agent.steps", len(usage))
+        span.set_attribute("agent.stopped", stopped)
+
+    def record_llm_usage(self, span, usage: dict):
+        for kind in ("prompt_tokens", "cached_tokens", "output_tokens"):
+            LLM_TOKENS.observe(usage[kind], model=self.model, kind=kind.removesuffix("_tokens"))
+            span.set_attribute(f"llm.{kind}", usage[kind])
+
+    async def collect_server_stats(self, timeout: float = 2):
+        """
+        Reads the `cache://stats` resource of every running server replica
+        into `server_stats`. Servers that do not offer it are not asked again.
+        """
+        async def read(server_name: str, index: int, session: ClientSession):
+            try:
+                result = await asyncio.wait_for(session.read_resource("cache://stats"), timeout=timeout)
+                self.server_stats[(server_name, str(index))] = json.loads(result.contents[0].text)
+            except McpError:
+                self._servers_without_stats.add(server_name)
+            except Exception as e:
+                self.logger.debug("Could not read cache stats from %s replica %s: %s", server_name, index, e)
+
+        await asyncio.gather(*(
+            read(server_name, index, replica.session)
+            for server_name, connection in self.connections.items()
+            if server_name not in self._servers_without_stats
+            for index, replica in enumerate(connection.replicas)
+            if replica.connected
+        ))
+
+    def metric_families(self) -> list:
+        """Cache and coalescing counters in the form `telemetry.MetricsRegistry` collectors return."""
+        families = []
+        caches = {"answer": self.answer_cache, "context": self.context_cache}
+        for outcome in ("hits", "misses"):
+            samples = [
+                ({"cache": name}, cache.stats[outcome]) for name, cache in caches.items() if cache is not None
+            ]
+            families.append((f"mcp_client_cache_{outcome}_total", "counter", f"Cache {outcome} by cache", samples))
+        families.append((
+            "mcp_client_tool_calls_coalesced_total",
+            "counter",
+            "Tool calls that shared an identical in-flight call",
+            [({}, self.inflight_tool_calls.stats["shared"])],
+        ))
+
+        server_cache_samples = []
+        server_coalesced_samples = []
+        for (server_name, replica), stats in sorted(self.server_stats.items()):
+            for group, counters in stats.items():
+                if group == "inflight":
+                    server_coalesced_samples.append(
+                        ({"server": server_name, "replica": replica}, counters.get("shared", 0))
+                    )
+                    continue
+                for event, value in sorted(counters.items()):
+                    labels = {"server": server_name, "replica": replica, "cache": group, "event": event}
+                    server_cache_samples.append((labels, value))
+        families.append((
+            "mcp_server_cache_events_total",
+            "counter",
+            "MCP server cache hits, misses and revalidations by cache, from cache://stats",
+            server_cache_samples,
+        ))
+        families.append((
+            "mcp_server_calls_coalesced_total",
+            "counter",
+            "MCP server calls that shared an identical in-flight call, from cache://stats",
+            server_coalesced_samples,
+        ))
+        return families
+
+    # run every function call of a model turn concurrently
+    async def run_function_calls(self, function_calls: list) -> types.Content:
+        function_responses = await asyncio.gather(
+            *(self.call_tool(part.function_call.name, part.function_call.args) for part in function_calls)
+        )
+        return types.Content(
+            role='tool',
+            parts=[
+                types.Part.from_function_response(name=part.function_call.name, response=function_response)
+                for part, function_response in zip(function_calls, function_responses)
+            ]
+        )
+
+    def max_steps_message(self) -> types.Content:
+        self.logger.warning(f"Stopped agent loop after {self.max_steps} steps")
+        return types.Content(
+            role='model',
+            parts=[types.Part.from_text(text=f"Stopped after {self.max_steps} tool steps without a final answer.")]
+        )
+
+    # call a tool on the MCP session that provides it
+    async def call_tool(self, tool_name: str, tool_args: dict) -> dict:
+        server_name = self.tool_routes.get(tool_name)
+        if server_name is None:
+            return {"error": f"Tool {tool_name} not found in any session"}
+
+        connection = self.connections[server_name]
+        start = time.perf_counter()
+        outcome = "error"
+        with self.tracer.span("call_tool", {"tool.name": tool_name, "tool.server": server_name}, kind="CLIENT") as span:
+            # The server continues this trace from the request's _meta
+            meta = {"traceparent": span.traceparent} if span.traceparent else None
+            try:
+                if self.coalesce_tool_calls and connection.coalesce:
+                    # Identical calls already in flight share one result
+                    key = json.dumps([server_name, tool_name, tool_args], sort_keys=True, default=str)
+                    result = await self.inflight_tool_calls.do(
+                        key, connection.call_tool, tool_name, tool_args, self.tool_timeout, meta=meta
+                    )
+                else:
+                    result = await connection.call_tool(tool_name, tool_args, self.tool_timeout, meta=meta)
+                outcome = "error" if result.isError else "ok"
+                span.set_attribute("tool.is_error", bool(result.isError))
+                return {"result": result.content}
+            except asyncio.TimeoutError as e:
+                outcome = "timeout"
+                span.record_error(e)
+                self.logger.error(f"Tool {tool_name} on {server_name} timed out after {self.tool_timeout}s")
+                return {"error": f"Tool {tool_name} timed out after {self.tool_timeout}s"}
+            except Exception as e:
+                span.record_error(e)
+                self.logger.error(f"Error calling tool {tool_name} on {server_name}: {e}")
+                return {"error": f"Tool {tool_name} failed on {server_name}: {e}"}
+            finally:
+                TOOL_LATENCY.observe(time.perf_counter() - start, tool=tool_name, server=server_name, outcome=outcome)
+
+    def llm_config(self, tool_names: Optional[List[str]] = None):
+        """
+        Returns the generation config for the current tool list, built once per
+        tool version and reused. `tool_names` restricts the tools sent to Gemini.
+        """
+        key = frozenset(tool_names) if tool_names else None
+        config = self._llm_configs.get(key)
+        if config is None:
+            tools = self.tools
+            if key is not None:
+                tools = [tool for tool in self.tools if tool.function_declarations[0].name in key]
+            config = types.GenerateContentConfig(
+                temperature=0,
+                tools=tools or None,
+                #max_output_tokens=1000
+            )
+            self._llm_configs[key] = config
+        return config
+
+    # compact the history and move its stable prefix into a context cache
+    async def prepare_request(self, messages: list, tool_names: Optional[List[str]], prefix_length: int):
+        config = self.llm_config(tool_names)
+
+        if self.context_cache is not None and prefix_length > 0:
+            # The cached prefix is never compacted, so it stays byte-identical and
+            # keeps hitting the same cache while later steps compact the rest
+            prefix = messages[:prefix_length]
+            try:
+                cache_name = await self.context_cache.get(
+                    prefix,
+                    config.tools,
+                    self.tools_version,
+                    frozenset(tool_names) if tool_names else None,
+                )
+                if cache_name:
+                    remaining_budget = max(0, self.history_token_budget - estimate_tokens(prefix))
+                    # Tools live in the cache and must not be sent again
+                    return compact_history(
+                        messages[prefix_length:], remaining_budget, self.compacted_tool_result_chars
+                    ), types.GenerateContentConfig(
                         temperature=0,
-                        tools=self.tools,
-                        #max_output_tokens=1000
+                        cached_content=cache_name,
                     )
+            except Exception as e:
+                self.logger.warning(f"Context caching failed, sending full history: {e}")
+
+        return compact_history(messages, self.history_token_budget, self.compacted_tool_result_chars), config
+
+    # call llm
+    async def call_llm(self, messages: list, tool_names: Optional[List[str]] = None, prefix_length: int = 0):
+        start = time.perf_counter()
+        outcome = "error"
+        with self.tracer.span("call_llm", {"llm.model": self.model, "llm.stream": False}, kind="CLIENT") as span:
+            try:
+                self.logger.info("Calling LLM")
+                contents, config = await self.prepare_request(messages, tool_names, prefix_length)
+                span.set_attribute("llm.context_cache", bool(config.cached_content))
+                response = await self.llm.aio.models.generate_content(
+                        model=self.model,
+                        contents=contents,
+                        config=config
+                    )
+                outcome = "ok"
+                usage = usage_from_response(response)
+                self.record_llm_usage(span, usage)
+                self.logger.debug("LLM usage: %s", usage)
+                return response
+            except Exception as e:
+                self.logger.error(f"Error calling LLM: {e}")
+                raise
+            finally:
+                LLM_LATENCY.observe(time.perf_counter() - start, model=self.model, stream="false", outcome=outcome)
+
+    # call llm, streaming the response
+    async def call_llm_stream(self, messages: list, tool_names: Optional[List[str]] = None, prefix_length: int = 0):
+        try:
+            self.logger.info("Calling LLM (streaming)")
+            contents, config = await self.prepare_request(messages, tool_names, prefix_length)
+            return await self.llm.aio.models.generate_content_stream(
+                    model=self.model,
+                    contents=contents,
+                    config=config
                 )
         except Exception as e:
             self.logger.error(f"Error calling LLM: {e}")
@@ -224,80 +710,80 @@ class MCPClient:
     # cleanup
     async def cleanup(self):
         try:
-            await self.exit_stack.aclose()
-            self.sessions.clear()
+            for task in list(self._background_tasks):
+                task.cancel()
+            await asyncio.gather(*(connection.stop() for connection in self.connections.values()))
+            await self.conversation_log.close()
+            await self.conversations.close()
+            self.tracer.close()
             self.logger.info("Disconnected from all MCP servers")
         except Exception as e:
             self.logger.error(f"Error during cleanup: {e}")
             traceback.print_exc()
             raise
 
-    async def log_conversation(self):
-        os.makedirs("conversations", exist_ok=True)
-
-        serializable_conversation = []
+    async def log_conversation(self, messages: list, conversation_id: Optional[str] = None, usage: Optional[list] = None):
+        usage = usage or []
+        self.logger.info(
+            f"Token usage over {len(usage)} LLM calls: "
+            f"{sum(step['prompt_tokens'] for step in usage)} in "
+            f"({sum(step['cached_tokens'] for step in usage)} cached), "
+            f"{sum(step['output_tokens'] for step in usage)} out"
+        )
+        self.conversation_log.submit({
+            "timestamp": datetime.now().isoformat(),
+            "conversation_id": conversation_id,
+            "usage": usage,
+            "messages": list(messages),
+        })
 
-        for message in self.messages:
-            try:
-                serializable_message = {"role": message.role, "parts": []}
-
-                # Handle both string and list content
-                if isinstance(message.parts, str):
-                    serializable_message["parts"] = message.parts
-                elif isinstance(message.parts, list):
-                    for content_item in message.parts:
-                        if hasattr(content_item, "to_dict"):
-                            serializable_message["parts"].append(
-                                content_item.to_dict()
-                            )
-                        elif hasattr(content_item, "dict"):
-                            serializable_message["parts"].append(content_item.dict())
-                        elif hasattr(content_item, "model_dump"):
-                            serializable_message["parts"].append(
-                                content_item.model_dump()
-                            )
-                        else:
-                            serializable_message["parts"].append(content_item)
-
-                serializable_conversation.append(serializable_message)
-            except Exception as e:
-                self.logger.error(f"Error processing message: {str(e)}")
-                self.logger.debug(f"Message content: {message}")
-                raise
+def clean_schema(schema):
+    """
+    Recursively removes fields Gemini does not accept from a JSON schema.
 
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        filepath = os.path.join("conversations", f"conversation_{timestamp}.json")
+    The input is left untouched so the original MCP schemas can still be served.
 
-        try:
-            with open(filepath, "w") as f:
-                json.dump(serializable_conversation, f, indent=2, default=str)
-        except Exception as e:
-            self.logger.error(f"Error writing conversation to file: {str(e)}")
-            self.logger.debug(f"Serializable conversation: {serializable_conversation}")
-            raise
+    Args:
+        schema (dict): The schema dictionary.
 
-def clean_schema(schema):
+    Returns:
+        dict: Cleaned copy of the schema without 'title' and exclusive bound fields.
     """
-    Recursively removes 'title' fields from the JSON schema.
+    if not isinstance(schema, dict):
+        return schema
+
+    cleaned = {
+        key: value for key, value in schema.items()
+        if key not in ("title", "exclusiveMaximum", "exclusiveMinimum")
+    }
+
+    if "properties" in cleaned and isinstance(cleaned["properties"], dict):
+        properties = {}
+        for key, value in cleaned["properties"].items():
+            value = clean_schema(value)
+            if key == 'url' and isinstance(value, dict) and value.get('format') == 'uri':
+                value = {**value, 'format': None}
+            properties[key] = value
+        cleaned["properties"] = properties
+
+    return cleaned
+
+def tools_fingerprint(mcp_tools) -> str:
+    """
+    Hashes the MCP tool definitions, so converted declarations are only rebuilt when they change.
 
     Args:
-        schema (dict): The schema dictionary.
+        mcp_tools (list): List of MCP tool objects.
 
     Returns:
-        dict: Cleaned schema without 'title' fields.
+        str: Short hex digest identifying this version of the tool list.
     """
-    if isinstance(schema, dict):
-        schema.pop("title", None)
-        schema.pop("exclusiveMaximum", None)
-        schema.pop("exclusiveMinimum", None)
-
-        if "properties" in schema and isinstance(schema["properties"], dict):
-            for key in schema["properties"]:
-                if 'url' in schema["properties"] and key == 'url' and schema["properties"][key]['format'] == 'uri':
-                    schema["properties"][key]['format'] = None
-                schema["properties"][key] = clean_schema(schema["properties"][key])
-
-    return schema
+    payload = json.dumps(
+        [[tool.name, tool.description, tool.inputSchema] for tool in mcp_tools],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
 
 def convert_mcp_tools_to_gemini(mcp_tools):
     """
@@ -0,0 +1,279 @@
+from typing import Optional, List
+import asyncio
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+import anyio
+from mcp import ClientSession, StdioServerParameters
+from mcp import types as mcp_types
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+
+class ServerConnection:
+    """
+    One MCP server and its client session.
+
+    Config entries with a `url` connect to a running server over streamable
+    HTTP; entries with `command`/`args` spawn a stdio server process.
+
+    The stdio transport and session are entered and exited by a single
+    long-lived task, as anyio requires, so several servers can be started
+    concurrently and stopped independently of the task that started them.
+    Messages from the transport are relayed to the session, so a server
+    process that exits or a dropped connection is noticed at once and the
+    connection stops reporting itself as connected.
+    """
+
+    def __init__(self, name: str, server_info: dict, message_handler=None, start_timeout: float = 60, on_ready=None):
+        self.name = name
+        self.server_info = server_info
+        self.message_handler = message_handler
+        self.on_ready = on_ready
+        self.start_timeout = float(server_info.get("timeout", start_timeout))
+        self.lazy = bool(server_info.get("lazy", False))
+        self.session: Optional[ClientSession] = None
+        self.error: Optional[BaseException] = None
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.outstanding = 0
+        self.failed_pings = 0
+
+    @property
+    def connected(self) -> bool:
+        return self.session is not None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        """Begins connecting in the background; await `wait_ready` for the outcome."""
+        if self._task is None:
+            self._ready.clear()
+            self._stop.clear()
+            self.error = None
+            self._task = asyncio.create_task(self._run(), name=f"mcp-server-{self.name}")
+
+    async def wait_ready(self) -> bool:
+        await self._ready.wait()
+        return self.connected
+
+    @asynccontextmanager
+    async def _transport(self):
+        if "url" in self.server_info:
+            async with streamablehttp_client(
+                self.server_info["url"], headers=self.server_info.get("headers")
+            ) as (read, write, _):
+                yield read, write
+        else:
+            server_params = StdioServerParameters(
+                command=self.server_info["command"],
+                args=self.server_info["args"],
+                env=self.server_info.get("env"),
+            )
+            async with stdio_client(server_params) as (read, write):
+                yield read, write
+
+    @staticmethod
+    async def _relay(source, sink):
+        """Forwards transport messages to the session; returns when the transport closes."""
+        try:
+            async with sink:
+                async for message in source:
+                    await sink.send(message)
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream):
+            pass
+
+    async def _run(self):
+        try:
+            async with self._transport() as (read, write):
+                sink, relayed = anyio.create_memory_object_stream(0)
+                relay = asyncio.create_task(self._relay(read, sink))
+                stopping = asyncio.create_task(self._stop.wait())
+                try:
+                    async with ClientSession(relayed, write, message_handler=self.message_handler) as session:
+                        await asyncio.wait_for(session.initialize(), timeout=self.start_timeout)
+                        self.session = session
+                        self._ready.set()
+                        if self.on_ready is not None:
+                            self.on_ready(self)
+                        await asyncio.wait({relay, stopping}, return_when=asyncio.FIRST_COMPLETED)
+                        if not self._stop.is_set():
+                            # Stop routing calls here before the session is torn down
+                            self.session = None
+                            raise ConnectionError(f"MCP server {self.name} exited or closed the connection")
+                finally:
+                    relay.cancel()
+                    stopping.cancel()
+        except Exception as e:
+            self.error = e
+            if isinstance(e, ConnectionError):
+                print(f"⚠️  {e}")
+        finally:
+            self.session = None
+            self._ready.set()
+            self._task = None
+
+    async def stop(self):
+        task = self._task
+        if task is None:
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(task, timeout=10)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            task.cancel()
+
+
+class ServerPool:
+    """
+    Supervised replicas of one configured MCP server.
+
+    `replicas` processes are started from the same config entry. A
+    background supervisor pings each one on a schedule and restarts replicas
+    that have exited or stopped answering, backing off exponentially between
+    attempts. Tool calls go to the healthy replica with the fewest
+    outstanding calls. `on_ready` is called with the replica every time one
+    finishes starting: at startup, on a lazy first use and after a restart.
+    """
+
+    def __init__(self, name: str, server_info: dict, message_handler=None, start_timeout: float = 60, on_ready=None):
+        self.name = name
+        self.server_info = server_info
+        self.lazy = bool(server_info.get("lazy", False))
+        # Identical concurrent calls to this server may share one result
+        self.coalesce = bool(server_info.get("coalesce", True))
+        self.replicas: List[ServerConnection] = [
+            ServerConnection(
+                name, server_info, message_handler=message_handler, start_timeout=start_timeout, on_ready=on_ready
+            )
+            for _ in range(max(1, int(server_info.get("replicas", 1))))
+        ]
+        self.ping_interval = float(os.getenv("MCP_SERVER_PING_INTERVAL", "15"))
+        self.ping_timeout = float(os.getenv("MCP_SERVER_PING_TIMEOUT", "5"))
+        self.max_failed_pings = int(os.getenv("MCP_SERVER_MAX_FAILED_PINGS", "2"))
+        self.restart_backoff = float(os.getenv("MCP_SERVER_RESTART_BACKOFF", "1"))
+        self.restart_backoff_max = float(os.getenv("MCP_SERVER_RESTART_BACKOFF_MAX", "60"))
+        self._restart_attempts = [0] * len(self.replicas)
+        self._next_restart = [0.0] * len(self.replicas)
+        self._supervisor: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return any(replica.connected for replica in self.replicas)
+
+    @property
+    def session(self) -> Optional[ClientSession]:
+        for replica in self.replicas:
+            if replica.connected:
+                return replica.session
+        return None
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        for replica in self.replicas:
+            if replica.error is not None:
+                return replica.error
+        return None
+
+    def start(self):
+        for replica in self.replicas:
+            replica.start()
+        if self._supervisor is None:
+            self._supervisor = asyncio.create_task(self._supervise(), name=f"mcp-supervisor-{self.name}")
+
+    async def wait_ready(self) -> bool:
+        """Waits until one replica is up, or all of them have failed."""
+        waiters = [asyncio.create_task(replica.wait_ready()) for replica in self.replicas]
+        try:
+            for waiter in asyncio.as_completed(waiters):
+                if await waiter:
+                    return True
+            return False
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+    async def ensure_started(self):
+        async with self._start_lock:
+            if self._supervisor is None:
+                self.start()
+        if not await self.wait_ready():
+            raise RuntimeError(f"MCP server {self.name} failed to start: {self.error}")
+
+    def _pick_replica(self) -> ServerConnection:
+        healthy = [replica for replica in self.replicas if replica.connected and replica.failed_pings == 0]
+        if not healthy:
+            healthy = [replica for replica in self.replicas if replica.connected]
+        if not healthy:
+            raise RuntimeError(f"No healthy replica of MCP server {self.name}: {self.error}")
+        fewest = min(replica.outstanding for replica in healthy)
+        return random.choice([replica for replica in healthy if replica.outstanding == fewest])
+
+    async def call_tool(self, tool_name: str, tool_args: dict, timeout: float, meta: Optional[dict] = None):
+        """Calls a tool on a healthy replica. `meta` is sent as the request's `_meta`, e.g. trace context."""
+        if not self.connected:
+            await self.ensure_started()
+        replica = self._pick_replica()
+        replica.outstanding += 1
+        try:
+            if meta:
+                request = mcp_types.ClientRequest(
+                    mcp_types.CallToolRequest(
+                        method="tools/call",
+                        params=mcp_types.CallToolRequestParams.model_validate(
+                            {"name": tool_name, "arguments": tool_args, "_meta": meta}
+                        ),
+                    )
+                )
+                call = replica.session.send_request(request, mcp_types.CallToolResult)
+            else:
+                call = replica.session.call_tool(tool_name, tool_args)
+            return await asyncio.wait_for(call, timeout=timeout)
+        finally:
+            replica.outstanding -= 1
+
+    async def _supervise(self):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            await asyncio.gather(*(self._check(index) for index in range(len(self.replicas))))
+
+    async def _check(self, index: int):
+        replica = self.replicas[index]
+        if replica.connected:
+            try:
+                await asyncio.wait_for(replica.session.send_ping(), timeout=self.ping_timeout)
+                replica.failed_pings = 0
+                self._restart_attempts[index] = 0
+                return
+            except Exception as e:
+                replica.failed_pings += 1
+                print(f"⚠️  Ping to MCP server {self.name} failed ({replica.failed_pings}): {e}")
+                if replica.failed_pings < self.max_failed_pings:
+                    return
+        elif replica.running:
+            # Still starting up
+            return
+
+        if time.monotonic() < self._next_restart[index]:
+            return
+        attempts = self._restart_attempts[index]
+        self._restart_attempts[index] = attempts + 1
+        self._next_restart[index] = time.monotonic() + min(
+            self.restart_backoff * 2 ** attempts, self.restart_backoff_max
+        )
+
+        print(f"🔄 Restarting MCP server {self.name} (attempt {attempts + 1})")
+        await replica.stop()
+        replica.failed_pings = 0
+        replica.start()
+
+    async def stop(self):
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            self._supervisor = None
+        await asyncio.gather(*(replica.stop() for replica in self.replicas))
@@ -0,0 +1,34 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls.
+
+    The first caller for a key starts the work as a task; callers arriving
+    with the same key while it runs await that task and get the same result
+    or exception. A waiter that is cancelled does not cancel the shared work.
+    The key is forgotten once the work finishes, so this is not a cache.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task] = {}
+        self.stats = {"started": 0, "shared": 0}
+
+    async def do(self, key: str, coro_fn, *args, **kwargs):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(coro_fn(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.stats["started"] += 1
+        else:
+            self.stats["shared"] += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Nobody may be left awaiting a failed call; retrieve its exception so it is not logged as unhandled
+        if not task.cancelled():
+            task.exception()
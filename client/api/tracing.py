@@ -0,0 +1,217 @@
+"""
+OpenTelemetry-shaped tracing with a JSON lines file exporter.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+import json
+import os
+import queue
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    def __init__(
+        self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool,
+        attributes: Optional[dict] = None, kind: str = "INTERNAL",
+    ):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = {"code": "STATUS_CODE_UNSET"}
+
+    @property
+    def traceparent(self) -> str:
+        """W3C trace context header value naming this span as the parent."""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.status = {"code": "STATUS_CODE_ERROR", "message": f"{type(error).__name__}: {error}"}
+
+    def to_otlp(self, service_name: str) -> dict:
+        """The span in the OTLP/JSON span layout, plus the emitting service."""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": f"SPAN_KIND_{self.kind}",
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": self.status,
+            "resource": {"service.name": service_name},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    traceparent = None
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def record_error(self, error: BaseException):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class FileSpanExporter:
+    """
+    Appends finished spans as JSON lines from a background thread.
+
+    The file is rolled over to `<path>.1` once it passes `max_bytes`.
+    Spans are dropped, not waited for, if the queue is full.
+    """
+
+    def __init__(self, path: str, service_name: str, max_bytes: int = 50 * 1024 * 1024, max_queue: int = 10000):
+        self.path = path
+        self.service_name = service_name
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 500:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in batch
+            spans = [span for span in batch if span is not None]
+            if spans:
+                try:
+                    self._write(spans)
+                except Exception as e:
+                    # Not stdout, which carries the docs server's MCP stdio transport
+                    print(f"❌ Error writing spans: {e}", file=sys.stderr)
+            if stopping:
+                return
+
+    def _write(self, spans: list):
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            os.replace(self.path, f"{self.path}.1")
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_otlp(self.service_name), default=str) + "\n")
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Minimal tracer producing OpenTelemetry-shaped spans.
+
+    The current span is held in a context variable, so spans opened inside
+    tasks started under a span become its children. A root span either
+    continues an incoming W3C `traceparent` or starts a new trace, sampled
+    at `sample_rate`. With no exporter every span is a cheap no-op.
+    """
+
+    def __init__(self, exporter: Optional[FileSpanExporter] = None, sample_rate: float = 1.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    @classmethod
+    def from_env(cls, service_name: str) -> "Tracer":
+        if os.getenv("TRACING", "false").lower() != "true":
+            return cls()
+        exporter = FileSpanExporter(
+            os.getenv("TRACE_EXPORT_PATH") or os.path.join("traces", f"{service_name}.jsonl"),
+            service_name,
+            max_bytes=int(os.getenv("TRACE_EXPORT_MAX_BYTES", str(50 * 1024 * 1024))),
+        )
+        return cls(exporter, sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1.0")))
+
+    @contextmanager
+    def span(self, name: str, attributes: Optional[dict] = None, traceparent: Optional[str] = None, kind: str = "INTERNAL"):
+        if self.exporter is None:
+            yield _NOOP_SPAN
+            return
+
+        parent = _current_span.get()
+        match = _TRACEPARENT.match(traceparent or "")
+        if parent is not None:
+            span = Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes, kind)
+        elif match:
+            span = Span(name, match.group(1), match.group(2), match.group(3) == "01", attributes, kind)
+        else:
+            span = Span(name, secrets.token_hex(16), None, random.random() < self.sample_rate, attributes, kind)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except GeneratorExit:
+            # A streaming response closed early by its consumer
+            span.set_attribute("closed_early", True)
+            raise
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Async generators may be closed from another context than they ran in
+                pass
+            span.end_ns = time.time_ns()
+            if span.sampled:
+                self.exporter.export(span)
+
+    def current_traceparent(self) -> Optional[str]:
+        span = _current_span.get()
+        return span.traceparent if span is not None else None
+
+    def close(self):
+        if self.exporter is not None:
+            self.exporter.close()
+
@@ -1,10 +1,14 @@
 import asyncio
 import sys
 import streamlit as st
-from chatbot import Chatbot
 from dotenv import load_dotenv
 import os
 
+# Loaded before chatbot and the logger, which read their settings at import time
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'), override=True)
+
+from chatbot import Chatbot
+
 utils_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils'))
 sys.path.append(utils_path)
 
@@ -13,8 +17,6 @@ try:
 except ImportError as e:
     print("ImportError:", e)
 
-load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'), override=True)
-
 async def main():
     if "server_connected" not in st.session_state:
         st.session_state["server_connected"] = False
@@ -25,6 +27,9 @@ async def main():
     if "messages" not in st.session_state:
         st.session_state["messages"] = []
 
+    if "conversation_id" not in st.session_state:
+        st.session_state["conversation_id"] = None
+
     API_URL = os.getenv("MCP_SERVER_HOST_URL")
     if not API_URL:
         st.error("MCP SERVER HOST URL not found. Please add it to your .env file.")
@@ -1,12 +1,54 @@
 import streamlit as st
 import httpx
 from typing import Dict, Any
+import asyncio
+import importlib.util
 import json
+import os
+import time
+
+TOOLS_CACHE_TTL = int(os.getenv("FRONTEND_TOOLS_CACHE_TTL", "60"))
+TOOLS_FETCH_RETRIES = int(os.getenv("FRONTEND_TOOLS_FETCH_RETRIES", "2"))
+
+
+@st.cache_resource
+def get_http_client() -> httpx.Client:
+    """
+    One pooled client per Streamlit process, shared by every session and rerun.
+
+    Each rerun runs in a fresh event loop, which an AsyncClient's connections
+    cannot outlive, so this is a thread-safe sync client called via worker
+    threads. The transport retries failed connection attempts.
+    """
+    transport = httpx.HTTPTransport(
+        verify=False,
+        http2=importlib.util.find_spec("h2") is not None,
+        retries=2,
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+    )
+    return httpx.Client(transport=transport, timeout=httpx.Timeout(120, connect=10))
+
+
+@st.cache_data(ttl=TOOLS_CACHE_TTL, show_spinner=False)
+def fetch_tools(api_url: str) -> dict:
+    """The API's tool list, refetched at most every TOOLS_CACHE_TTL seconds."""
+    client = get_http_client()
+    for attempt in range(TOOLS_FETCH_RETRIES + 1):
+        try:
+            response = client.get(f"{api_url}/tools", timeout=30)
+            if response.status_code < 500 or attempt == TOOLS_FETCH_RETRIES:
+                response.raise_for_status()
+                return response.json()
+        except httpx.TransportError:
+            if attempt == TOOLS_FETCH_RETRIES:
+                raise
+        time.sleep(0.5 * 2 ** attempt)
+
 
 class Chatbot:
     def __init__(self, api_url: str):
         self.api_url = api_url
-        self.current_tool_call = {"name": None, "args": None}
+        self.current_tool_calls = []
         self.messages = st.session_state["messages"]
 
     def display_message(self, message: Dict[str, Any]):
@@ -15,23 +57,28 @@ class Chatbot:
             st.chat_message("user").markdown(message["parts"][0]["text"])
 
         # tool call
-        if message["role"] == "model" and message["parts"][0]["functionCall"] is not None and message["parts"][0]["functionResponse"] is None:
-                self.current_tool_call = {
-                        "name": message["parts"][0]["functionCall"]["name"],
-                        "args": message["parts"][0]["functionCall"]["args"]
-                }
+        if message["role"] == "model" and any(part["functionCall"] is not None for part in message["parts"]):
+                # Results come back in call order, and one turn may call the same tool twice
+                self.current_tool_calls = [
+                        part["functionCall"]["args"]
+                        for part in message["parts"]
+                        if part["functionCall"] is not None
+                ]
 
 
         # tool result
         if message["role"] == "tool" and message["parts"][0]["functionResponse"] is not None:
-             for content in message["parts"]:
+             for index, content in enumerate(message["parts"]):
+                tool_name = content["functionResponse"]["name"]
                 with st.chat_message("assistant"):
-                    st.write(f"Called tool: {self.current_tool_call['name']}")
+                    st.write(f"Called tool: {tool_name}")
                     st.json(
                         {
-                            "name": self.current_tool_call["name"],
-                            "args": self.current_tool_call["args"],
-                            "content": content["functionResponse"]["response"]["result"][0]["text"],
+                            "name": tool_name,
+                            "args": self.current_tool_calls[index] if index < len(self.current_tool_calls) else None,
+                            "content": "\n\n".join(
+                                item["text"] for item in content["functionResponse"]["response"].get("result", [])
+                            ) or content["functionResponse"]["response"].get("error"),
                         },
                         expanded=False,
                     )
@@ -42,12 +89,8 @@ class Chatbot:
 
 
     async def get_tools(self):
-        async with httpx.AsyncClient(timeout=30, verify=False) as client:
-            response = await client.get(
-                f"{self.api_url}/tools",
-                headers={"Content-Type": "application/json"},
-            )
-            return response.json()
+        # Served from st.cache_data on most reruns, so no worker thread is needed
+        return fetch_tools(self.api_url)
 
     async def render(self):
         st.title("MCP Host Application")
@@ -63,19 +106,21 @@ class Chatbot:
 
         query = st.chat_input("Enter your query here")
         if query:
-            async with httpx.AsyncClient(timeout=120, verify=False) as client:
-                try:
-                    response = await client.post(
-                        f"{self.api_url}/query",
-                        json={"query": query},
-                        headers={"Content-Type": "application/json"},
-                    )
-                    if response.status_code == 200:
-                        messages = response.json()
-                        st.session_state["messages"] = messages["messages"]
-                        for message in st.session_state["messages"]:
-                            self.display_message(message)
-                except httpx.TimeoutException as e:
-                    st.error("Error processing query: Timeout Exception")
-                except Exception as e:
-                    st.error(f"Frontend: Error processing query: {str(e)}")
\ No newline at end of file
+            try:
+                # Not retried: a query is expensive and not idempotent
+                response = await asyncio.to_thread(
+                    get_http_client().post,
+                    f"{self.api_url}/query",
+                    json={"query": query, "conversation_id": st.session_state.get("conversation_id")},
+                    headers={"Content-Type": "application/json"},
+                )
+                if response.status_code == 200:
+                    messages = response.json()
+                    st.session_state["conversation_id"] = messages["conversation_id"]
+                    st.session_state["messages"] = messages["messages"]
+                    for message in st.session_state["messages"]:
+                        self.display_message(message)
+            except httpx.TimeoutException as e:
+                st.error("Error processing query: Timeout Exception")
+            except Exception as e:
+                st.error(f"Frontend: Error processing query: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,280 @@
+"""
+Load-test driver for the client API's /query path.
+
+By default the API app runs in this process, with its real lifespan,
+MCPClient and stdio MCP connections. Gemini is replaced by the scripted fake
+(loadtest/fake_gemini.py) and the MCP servers by the stub server. That lets the
+driver measure the app's own event-loop lag and memory next to request
+latency:
+
+    uv run python loadtest/driver.py --concurrency 32 --requests 2000
+
+To load an API that is already running (started with FAKE_GEMINI_SCRIPT set
+and a config pointing at the stub server), pass its URL, plus its PID for
+memory figures on Linux:
+
+    uv run python loadtest/driver.py --url http://localhost:8000 --server-pid 1234
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(LOADTEST_DIR), "api")
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))]
+
+
+def summarize_ms(values: list[float]) -> dict:
+    values = sorted(values)
+    return {
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p90_ms": round(percentile(values, 0.90) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+def rss_mb(pid: int | None = None) -> float | None:
+    """Resident set size from /proc, or None where that is unavailable."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class LoopMonitor:
+    """Samples how late a periodic sleep wakes up (event-loop lag) and the process RSS."""
+
+    def __init__(self, interval: float = 0.05, pid: int | None = None):
+        self.interval = interval
+        self.pid = pid
+        self.lags: list[float] = []
+        self.rss: list[float] = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+            if len(self.lags) % 20 == 0:
+                rss = rss_mb(self.pid)
+                if rss is not None:
+                    self.rss.append(rss)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+async def drive(client: httpx.AsyncClient, queries: list[str], args) -> dict:
+    """Runs `concurrency` workers, each sending a conversation of `turns` queries at a time."""
+    latencies, first_events, errors = [], [], []
+    counter = {"sent": 0}
+    deadline = time.monotonic() + args.duration if args.duration else None
+
+    def next_query() -> str | None:
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+        if deadline is None and counter["sent"] >= args.requests:
+            return None
+        counter["sent"] += 1
+        # Vary the text so responses and caches see a spread of queries
+        base = queries[counter["sent"] % len(queries)]
+        return base if counter["sent"] % args.unique_every else f"{base} (variant {counter['sent']})"
+
+    async def send(query: str, conversation_id: str | None) -> str | None:
+        payload = {"query": query, "conversation_id": conversation_id}
+        start = time.perf_counter()
+        if args.stream:
+            first = None
+            async with client.stream("POST", "/query/stream", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    if first is None:
+                        first = time.perf_counter() - start
+                    event = json.loads(line[len("data: "):])
+                    if event.get("type") == "error":
+                        raise RuntimeError(event.get("detail"))
+                    if event.get("type") == "done":
+                        conversation_id = event.get("conversation_id")
+            first_events.append(first or 0.0)
+        else:
+            response = await client.post("/query", json=payload)
+            response.raise_for_status()
+            conversation_id = response.json()["conversation_id"]
+        latencies.append(time.perf_counter() - start)
+        return conversation_id
+
+    async def worker():
+        conversation_id, turns = None, 0
+        while (query := next_query()) is not None:
+            try:
+                conversation_id = await send(query, conversation_id)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+                conversation_id = None
+            turns += 1
+            if turns >= args.turns:
+                conversation_id, turns = None, 0
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    wall = time.perf_counter() - started
+
+    result = {
+        "requests": len(latencies) + len(errors),
+        "errors": len(errors),
+        "wall_s": round(wall, 3),
+        "rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "latency": summarize_ms(latencies),
+    }
+    if args.stream:
+        result["first_event"] = summarize_ms(first_events)
+    if errors:
+        result["first_errors"] = errors[:5]
+    return result
+
+
+def write_stub_config(directory: str, args) -> str:
+    stub = [
+        os.path.join(LOADTEST_DIR, "stub_mcp_server.py"),
+        "--latency-ms", str(args.tool_latency_ms),
+        "--jitter-ms", str(args.tool_jitter_ms),
+        "--payload-bytes", str(args.payload_bytes),
+        "--extra-tools", str(args.extra_tools),
+    ]
+    config = {"mcpServers": {"stub": {"command": sys.executable, "args": stub, "replicas": args.replicas}}}
+    path = os.path.join(directory, "mcp_servers_config.json")
+    with open(path, "w") as f:
+        json.dump(config, f)
+    return path
+
+
+async def run_in_process(queries: list[str], args) -> dict:
+    sys.path.insert(0, API_DIR)
+    import main as api
+    from fake_gemini import FakeGeminiClient
+
+    api.create_llm = lambda: FakeGeminiClient.from_file(args.scenario)
+    with tempfile.TemporaryDirectory() as workdir:
+        # Set after importing the app, whose .env loading would override them
+        os.environ["MCP_TOOLS_CACHE_PATH"] = os.path.join(workdir, "mcp_tools_cache.json")
+        os.environ["CONVERSATION_LOG_DIR"] = os.path.join(workdir, "conversations")
+        api.settings.mcp_server_config_path = write_stub_config(workdir, args)
+
+        monitor = LoopMonitor()
+        async with api.app.router.lifespan_context(api.app):
+            transport = httpx.ASGITransport(app=api.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+                if args.warmup:
+                    await drive(client, queries, argparse.Namespace(**{**vars(args), "requests": args.warmup, "duration": None}))
+                rss_before = rss_mb()
+                monitor.start()
+                result = await drive(client, queries, args)
+                await monitor.stop()
+                rss_after = rss_mb()
+
+    result["event_loop_lag"] = summarize_ms(monitor.lags)
+    result["memory"] = memory_report(rss_before, rss_after, monitor.rss)
+    return result
+
+
+async def run_remote(queries: list[str], args) -> dict:
+    monitor = LoopMonitor(pid=args.server_pid)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+        if args.warmup:
+            await drive(client, queries, argparse.Namespace(**{**vars(args), "requests": args.warmup, "duration": None}))
+        rss_before = rss_mb(args.server_pid) if args.server_pid else None
+        monitor.start()
+        result = await drive(client, queries, args)
+        await monitor.stop()
+        rss_after = rss_mb(args.server_pid) if args.server_pid else None
+
+    # Lag of this driver's loop, not the server's; high values mean the driver is the bottleneck
+    result["driver_loop_lag"] = summarize_ms(monitor.lags)
+    if args.server_pid:
+        result["memory"] = memory_report(rss_before, rss_after, monitor.rss)
+    return result
+
+
+def memory_report(before: float | None, after: float | None, samples: list[float]) -> dict:
+    report = {"peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+    if before is not None and after is not None:
+        report.update({
+            "rss_start_mb": round(before, 1),
+            "rss_end_mb": round(after, 1),
+            "rss_growth_mb": round(after - before, 1),
+            "rss_max_sampled_mb": round(max(samples, default=after), 1),
+        })
+    return report
+
+
+if __name__ == "__main__":
+    def positive_int(value: str) -> int:
+        number = int(value)
+        if number < 1:
+            raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+        return number
+
+    parser = argparse.ArgumentParser(description="load test the client API's /query endpoint")
+    parser.add_argument("--url", help="API base URL; runs the app in this process when omitted")
+    parser.add_argument("--server-pid", type=int, help="PID of the API process, for memory figures with --url")
+    parser.add_argument("--scenario", default=os.path.join(LOADTEST_DIR, "scenario.json"),
+                        help="fake Gemini script; its 'queries' are the queries sent")
+    parser.add_argument("--concurrency", type=positive_int, default=16, help="requests in flight at once")
+    parser.add_argument("--requests", type=int, default=500, help="total requests, unless --duration is given")
+    parser.add_argument("--duration", type=float, help="seconds to run for instead of a request count")
+    parser.add_argument("--warmup", type=int, default=20, help="requests sent before measuring")
+    parser.add_argument("--turns", type=positive_int, default=3, help="queries per conversation before starting a new one")
+    parser.add_argument("--unique-every", type=positive_int, default=2,
+                        help="every Nth query is sent verbatim; the rest get a unique suffix")
+    parser.add_argument("--stream", action="store_true", help="use /query/stream and report time to first event "
+                        "(only meaningful with --url; the in-process transport buffers responses)")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout in seconds")
+    parser.add_argument("--tool-latency-ms", type=float, default=50, help="stub MCP tool latency")
+    parser.add_argument("--tool-jitter-ms", type=float, default=20, help="stub MCP tool latency jitter")
+    parser.add_argument("--payload-bytes", type=int, default=4096, help="stub MCP tool result size")
+    parser.add_argument("--extra-tools", type=int, default=0, help="extra no-op tools the stub server advertises")
+    parser.add_argument("--replicas", type=positive_int, default=1, help="stub MCP server replicas")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    args.scenario = os.path.abspath(args.scenario)
+    with open(args.scenario, "r") as f:
+        queries = json.load(f).get("queries") or ["hello"]
+
+    report = asyncio.run(run_remote(queries, args) if args.url else run_in_process(queries, args))
+    report["config"] = {key: value for key, value in vars(args).items() if key != "output"}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
@@ -0,0 +1,150 @@
+from types import SimpleNamespace
+import asyncio
+import copy
+import hashlib
+import json
+import math
+import random
+import re
+import uuid
+from google.genai import types
+from llm_context import estimate_tokens
+
+
+class FakeGeminiClient:
+    """
+    Stand-in for `genai.Client` that replays scripted model turns.
+
+    Only the async surface MCPClient uses is provided: `aio.models.generate_content`,
+    `aio.models.generate_content_stream`, `aio.models.embed_content` and
+    `aio.caches.create`. Embeddings hash the words of the text, so
+    rephrasings sharing most words land close together. The script
+    holds weighted scenarios, each a list of steps; a step waits `delay_ms`
+    (plus up to `jitter_ms`) and then answers with `function_calls` or `text`.
+    The scenario is picked from a hash of the user's query, so a query
+    always replays the same scenario, and the step from the number of model
+    turns taken since that query. "{query}" in tool call arguments is
+    replaced with the query text.
+
+    Example script:
+        {"scenarios": [{"weight": 1, "steps": [
+            {"delay_ms": 300, "function_calls": [{"name": "search_docs", "args": {"query": "{query}"}}]},
+            {"delay_ms": 500, "text": "Here is what the docs say."}
+        ]}]}
+    """
+
+    def __init__(self, script: dict, seed: int = 0):
+        self.scenarios = script["scenarios"]
+        self._weights = [scenario.get("weight", 1) for scenario in self.scenarios]
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.aio = SimpleNamespace(
+            models=SimpleNamespace(
+                generate_content=self.generate_content,
+                generate_content_stream=self.generate_content_stream,
+                embed_content=self.embed_content,
+            ),
+            caches=SimpleNamespace(create=self.create_cache),
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "FakeGeminiClient":
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    def _scenario(self, query: str) -> dict:
+        # Weighted choice keyed by the query, stable across processes
+        point = int(hashlib.sha256(query.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF * sum(self._weights)
+        for scenario, weight in zip(self.scenarios, self._weights):
+            point -= weight
+            if point <= 0:
+                return scenario
+        return self.scenarios[-1]
+
+    def _next_step(self, contents: list) -> tuple[dict, str]:
+        query, turns = "", 0
+        for message in reversed(contents):
+            if message.role == 'user':
+                query = "".join(part.text or "" for part in message.parts or [])
+                break
+            if message.role == 'model':
+                turns += 1
+        steps = self._scenario(query)["steps"]
+        return steps[min(turns, len(steps) - 1)], query
+
+    async def _wait(self, step: dict, fraction: float = 1.0):
+        delay = step.get("delay_ms", 0) + self._random.uniform(0, step.get("jitter_ms", 0))
+        if delay:
+            await asyncio.sleep(delay * fraction / 1000)
+
+    @staticmethod
+    def _substitute(value, query: str):
+        if isinstance(value, str):
+            return value.replace("{query}", query)
+        if isinstance(value, dict):
+            return {key: FakeGeminiClient._substitute(item, query) for key, item in value.items()}
+        if isinstance(value, list):
+            return [FakeGeminiClient._substitute(item, query) for item in value]
+        return value
+
+    def _parts(self, step: dict, query: str) -> list:
+        if step.get("function_calls"):
+            return [
+                types.Part(function_call=types.FunctionCall(
+                    name=call["name"], args=self._substitute(copy.deepcopy(call.get("args", {})), query)
+                ))
+                for call in step["function_calls"]
+            ]
+        return [types.Part.from_text(text=step.get("text", ""))]
+
+    @staticmethod
+    def _response(parts: list, prompt_tokens: int, output_chars: int) -> types.GenerateContentResponse:
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role='model', parts=parts), finish_reason="STOP")],
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_tokens,
+                candidates_token_count=output_chars // 4,
+                cached_content_token_count=0,
+            ),
+        )
+
+    async def generate_content(self, model: str, contents: list, config=None):
+        self.calls += 1
+        step, query = self._next_step(contents)
+        await self._wait(step)
+        parts = self._parts(step, query)
+        return self._response(parts, estimate_tokens(contents), len(json.dumps(step)))
+
+    async def generate_content_stream(self, model: str, contents: list, config=None):
+        self.calls += 1
+        step, query = self._next_step(contents)
+        chunk_count = max(1, int(step.get("stream_chunks", 4)))
+        prompt_tokens = estimate_tokens(contents)
+
+        async def chunks():
+            if step.get("function_calls"):
+                await self._wait(step)
+                yield self._response(self._parts(step, query), prompt_tokens, len(json.dumps(step)))
+                return
+            text = step.get("text", "")
+            size = max(1, -(-len(text) // chunk_count))
+            pieces = [text[start:start + size] for start in range(0, len(text), size)] or [""]
+            for piece in pieces:
+                await self._wait(step, 1 / len(pieces))
+                yield self._response([types.Part.from_text(text=piece)], prompt_tokens, len(piece))
+
+        return chunks()
+
+    async def embed_content(self, model: str, contents, config=None):
+        dimensions = getattr(config, "output_dimensionality", None) or 256
+        vector = [0.0] * dimensions
+        for word in re.findall(r"\w+", str(contents).lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            vector[int.from_bytes(digest[:4], "little") % dimensions] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        await asyncio.sleep(0.02)
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=[value / norm for value in vector])])
+
+    async def create_cache(self, model: str, config=None):
+        await asyncio.sleep(0.05)
+        return SimpleNamespace(name=f"cachedContents/fake-{uuid.uuid4().hex[:12]}")
@@ -0,0 +1,64 @@
+"""
+Stub MCP server for load tests.
+
+Serves `search_docs`, which sleeps for a configurable latency and returns a
+payload of a configurable size, plus optional no-op tools that only make
+the tool list longer. Arguments of a call override the command-line
+defaults, so a fake Gemini script can vary them per step.
+"""
+from mcp.server.fastmcp import FastMCP
+import argparse
+import asyncio
+import random
+
+
+parser = argparse.ArgumentParser(description="stub MCP server for load tests")
+parser.add_argument("--latency-ms", type=float, default=50, help="time each tool call takes")
+parser.add_argument("--jitter-ms", type=float, default=0, help="random extra latency, up to this much")
+parser.add_argument("--payload-bytes", type=int, default=4096, help="size of each tool result")
+parser.add_argument("--extra-tools", type=int, default=0, help="additional no-op tools to advertise")
+args = parser.parse_args()
+
+mcp = FastMCP("stub")
+
+FILLER = "The quick brown fox jumps over the lazy dog. "
+
+
+def make_payload(query: str, size: int) -> str:
+    header = f"Result for: {query}\n"
+    body_size = max(0, size - len(header))
+    return header + (FILLER * (body_size // len(FILLER) + 1))[:body_size]
+
+
+@mcp.tool()
+async def search_docs(query: str, latency_ms: float | None = None, payload_bytes: int | None = None) -> str:
+  """
+  Stub documentation search used for load testing.
+
+  Args:
+    query: The query to search for
+    latency_ms: Overrides how long the call takes
+    payload_bytes: Overrides the size of the result
+  """
+  latency = args.latency_ms if latency_ms is None else latency_ms
+  await asyncio.sleep((latency + random.uniform(0, args.jitter_ms)) / 1000)
+  return make_payload(query, args.payload_bytes if payload_bytes is None else payload_bytes)
+
+
+def make_extra_tool(index: int):
+    async def extra_tool(query: str) -> str:
+        return f"stub tool {index}: {query}"
+
+    return extra_tool
+
+
+for index in range(args.extra_tools):
+    mcp.add_tool(
+        make_extra_tool(index),
+        name=f"stub_tool_{index}",
+        description=f"No-op stub tool {index} that only lengthens the tool list.",
+    )
+
+
+if __name__ == "__main__":
+    mcp.run(transport="stdio")
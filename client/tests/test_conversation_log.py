@@ -0,0 +1,43 @@
+import gzip
+import os
+
+from conversation_log import _SegmentWriter
+
+
+def segments(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory))
+
+
+def test_rotation_counts_encoded_bytes(tmp_path):
+    writer = _SegmentWriter(str(tmp_path), max_bytes=100, rotate_seconds=3600, compress=False)
+    line = "é" * 60 + "\n"  # 61 characters, 121 bytes
+    for _ in range(3):
+        writer.write_batch([line])
+    writer.close()
+
+    paths = segments(tmp_path)
+    assert len(paths) == 3
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            assert f.read() == line
+
+
+def test_rotation_counts_compressed_bytes(tmp_path):
+    max_bytes = 500
+    writer = _SegmentWriter(str(tmp_path), max_bytes=max_bytes, rotate_seconds=3600, compress=True)
+    line = '{"answer": "' + "the same text " * 100 + '"}\n'
+    batches = 50
+    for _ in range(batches):
+        writer.write_batch([line])
+    writer.close()
+
+    paths = segments(tmp_path)
+    # Compressed batches are far smaller than their text, so many share a segment
+    assert 1 < len(paths) < batches
+    for path in paths[:-1]:
+        assert os.path.getsize(path) >= max_bytes
+    text = ""
+    for path in paths:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            text += f.read()
+    assert text == line * batches
@@ -0,0 +1,75 @@
+import asyncio
+import json
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("mcp")
+pytest.importorskip("google.genai")
+
+STUB_SERVER = Path(__file__).resolve().parents[1] / "loadtest" / "stub_mcp_server.py"
+
+# Exits before the handshake on its first run, then serves `flaky_tool`
+FLAKY_SERVER = textwrap.dedent(
+    """
+    import os
+    import sys
+
+    marker = sys.argv[1]
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        sys.exit(1)
+
+    from mcp.server.fastmcp import FastMCP
+
+    mcp = FastMCP("flaky")
+
+
+    @mcp.tool()
+    async def flaky_tool() -> str:
+        return "recovered"
+
+
+    mcp.run(transport="stdio")
+    """
+)
+
+
+def test_server_that_fails_its_first_start_is_routed_after_restart(tmp_path, monkeypatch):
+    import mcp_client
+
+    monkeypatch.setenv("MCP_SERVER_PING_INTERVAL", "0.2")
+    monkeypatch.setenv("MCP_SERVER_RESTART_BACKOFF", "0.1")
+    monkeypatch.setenv("MCP_TOOLS_CACHE_PATH", str(tmp_path / "tools_cache.json"))
+
+    flaky = tmp_path / "flaky_server.py"
+    flaky.write_text(FLAKY_SERVER)
+    config = tmp_path / "servers.json"
+    config.write_text(json.dumps({
+        "mcpServers": {
+            "stable": {"command": sys.executable, "args": [str(STUB_SERVER), "--latency-ms", "0"]},
+            "flaky": {"command": sys.executable, "args": [str(flaky), str(tmp_path / "started")], "timeout": 5},
+        }
+    }))
+
+    async def scenario():
+        client = mcp_client.MCPClient(llm=object())
+        try:
+            assert await client.connect_to_server(str(config))
+            for _ in range(200):
+                if "flaky_tool" in client.tool_routes:
+                    break
+                await asyncio.sleep(0.05)
+            assert client.tool_routes.get("flaky_tool") == "flaky"
+            assert "search_docs" in client.tool_routes
+            assert "flaky_tool" in [tool.function_declarations[0].name for tool in client.tools]
+
+            result = await client.call_tool("flaky_tool", {})
+            assert "error" not in result
+            assert result["result"][0].text == "recovered"
+        finally:
+            await client.cleanup()
+
+    asyncio.run(scenario())
@@ -0,0 +1,19 @@
+from pathlib import Path
+
+import pytest
+
+REPO = Path(__file__).resolve().parents[2]
+
+# The client and the docs server are separate projects, so these modules are
+# copied into both rather than imported from a shared package
+SHARED_MODULES = [
+    ("client/api/singleflight.py", "servers/singleflight.py"),
+    ("client/api/tracing.py", "servers/tracing.py"),
+]
+
+
+@pytest.mark.parametrize("client_copy, server_copy", SHARED_MODULES)
+def test_copies_are_identical(client_copy, server_copy):
+    assert (REPO / client_copy).read_text() == (REPO / server_copy).read_text(), (
+        f"{client_copy} and {server_copy} have diverged; apply the change to both"
+    )
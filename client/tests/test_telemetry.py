@@ -0,0 +1,109 @@
+import re
+
+import pytest
+
+from telemetry import MetricsRegistry
+
+SAMPLE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$")
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"(,|$)')
+UNESCAPE = {"n": "\n", "\\": "\\", '"': '"'}
+
+
+def parse_labels(text: str) -> dict:
+    labels = {}
+    position = 0
+    while position < len(text):
+        match = LABEL.match(text, position)
+        assert match, f"bad label set: {text!r}"
+        labels[match.group(1)] = re.sub(r"\\(.)", lambda m: UNESCAPE[m.group(1)], match.group(2))
+        position = match.end()
+    return labels
+
+
+def parse_exposition(text: str) -> dict:
+    """Families by name in the Prometheus text format: their HELP, TYPE and (name, labels, value) samples."""
+    assert text.endswith("\n")
+    families = {}
+    for line in text.splitlines():
+        if line.startswith("# "):
+            _, keyword, name, rest = (line.split(" ", 3) + [""])[:4]
+            family = families.setdefault(name, {"samples": []})
+            family[keyword.lower()] = rest
+            continue
+        match = SAMPLE.match(line)
+        assert match, f"bad sample line: {line!r}"
+        name, labels, value = match.groups()
+        family_name = re.sub(r"_(bucket|sum|count)$", "", name)
+        family = families.get(name) or families[family_name]
+        family["samples"].append((name, parse_labels(labels or ""), float(value)))
+    return families
+
+
+def histogram_series(family: dict, name: str) -> dict:
+    """Per label set (without `le`): bucket counts by `le`, sum and count."""
+    series = {}
+    for sample_name, labels, value in family["samples"]:
+        le = labels.pop("le", None)
+        entry = series.setdefault(tuple(sorted(labels.items())), {"buckets": {}})
+        if sample_name == f"{name}_bucket":
+            entry["buckets"][le] = value
+        else:
+            entry[sample_name[len(name) + 1:]] = value
+    return series
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    registry = MetricsRegistry()
+    latency = registry.histogram("test_latency_seconds", "Test latency", ("path",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 5):
+        latency.observe(value, path="/a")
+    # Bucket bounds are inclusive
+    latency.observe(0.1, path="/b")
+
+    family = parse_exposition(registry.render())["test_latency_seconds"]
+    assert family["type"] == "histogram"
+    assert family["help"] == "Test latency"
+
+    series = histogram_series(family, "test_latency_seconds")
+    assert series[(("path", "/a"),)] == {"buckets": {"0.1": 1, "1": 3, "+Inf": 4}, "sum": pytest.approx(6.05), "count": 4}
+    assert series[(("path", "/b"),)] == {"buckets": {"0.1": 1, "1": 1, "+Inf": 1}, "sum": pytest.approx(0.1), "count": 1}
+
+
+def test_label_values_are_escaped():
+    awkward = 'say "hi"\\path\nnext line'
+    registry = MetricsRegistry()
+    registry.histogram("test_escaped_seconds", "Escaping", ("path",), buckets=(1,)).observe(0.5, path=awkward)
+    registry.add_collector(lambda: [("test_events_total", "counter", "Events", [({"key": awkward}, 3)])])
+
+    text = registry.render()
+    assert '\\"hi\\"\\\\path\\nnext line' in text
+
+    families = parse_exposition(text)
+    for name, labels, _ in families["test_escaped_seconds"]["samples"]:
+        assert labels["path"] == awkward
+    assert families["test_events_total"]["type"] == "counter"
+    assert families["test_events_total"]["samples"] == [("test_events_total", {"key": awkward}, 3.0)]
+
+
+def test_metrics_endpoint_serves_valid_histograms():
+    pytest.importorskip("fastapi")
+    pytest.importorskip("mcp")
+    pytest.importorskip("google.genai")
+    from fastapi.testclient import TestClient
+    import main
+
+    # Not entered as a context manager, so no MCP servers are started
+    client = TestClient(main.app)
+    client.get("/metrics")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+
+    name = "mcp_client_request_duration_seconds"
+    family = parse_exposition(response.text)[name]
+    assert family["type"] == "histogram"
+    series = histogram_series(family, name)
+    assert (("method", "GET"), ("path", "/metrics"), ("status", "200")) in series
+    for entry in series.values():
+        counts = list(entry["buckets"].values())
+        assert counts == sorted(counts)
+        assert entry["buckets"]["+Inf"] == entry["count"]
@@ -0,0 +1,69 @@
+import asyncio
+import json
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("mcp")
+
+from server_connection import ServerPool
+from tracing import FileSpanExporter, Tracer
+
+SERVERS_DIR = Path(__file__).resolve().parents[2] / "servers"
+
+# Opens a server span from the request's _meta the way the docs server's tools do
+TRACE_SERVER = textwrap.dedent(
+    """
+    import json
+    import sys
+
+    sys.path.insert(0, sys.argv[1])
+
+    from mcp.server.fastmcp import Context, FastMCP
+    from tracing import FileSpanExporter, Tracer
+
+    tracer = Tracer(FileSpanExporter(sys.argv[2], "docs-server"))
+    mcp = FastMCP("trace")
+
+
+    @mcp.tool()
+    async def current_span(ctx: Context) -> str:
+        traceparent = getattr(ctx.request_context.meta, "traceparent", None)
+        with tracer.span("current_span", traceparent=traceparent, kind="SERVER") as span:
+            return json.dumps({"trace_id": span.trace_id, "parent_id": span.parent_id, "sampled": span.sampled})
+
+
+    mcp.run(transport="stdio")
+    """
+)
+
+
+def test_traceparent_round_trips_through_request_meta(tmp_path):
+    script = tmp_path / "trace_server.py"
+    script.write_text(TRACE_SERVER)
+    tracer = Tracer(FileSpanExporter(str(tmp_path / "client.jsonl"), "mcp-client"))
+
+    async def scenario():
+        args = [str(script), str(SERVERS_DIR), str(tmp_path / "server.jsonl")]
+        pool = ServerPool("trace", {"command": sys.executable, "args": args})
+        pool.start()
+        try:
+            assert await pool.wait_ready()
+            with tracer.span("call_tool", kind="CLIENT") as span:
+                result = await pool.call_tool("current_span", {}, 10, meta={"traceparent": span.traceparent})
+            untraced = await pool.call_tool("current_span", {}, 10)
+        finally:
+            await pool.stop()
+            tracer.close()
+        return span, json.loads(result.content[0].text), json.loads(untraced.content[0].text)
+
+    client_span, server_span, untraced = asyncio.run(scenario())
+    assert server_span == {"trace_id": client_span.trace_id, "parent_id": client_span.span_id, "sampled": True}
+    assert untraced["trace_id"] != client_span.trace_id
+    assert untraced["parent_id"] is None
+
+    exported = json.loads((tmp_path / "client.jsonl").read_text())
+    assert exported["traceId"] == client_span.trace_id
+    assert exported["spanId"] == client_span.span_id
@@ -1,19 +1,215 @@
+"""
+Client logging.
+
+Records are handed to a background thread through a bounded queue, so
+callers never wait on file or console I/O; if the queue is full the
+record is dropped and counted instead. The file is written as JSON lines
+and rotated by size. Request and conversation IDs bound with
+`log_context` are added to every record logged under them.
+
+DEBUG lines on hot paths can be thinned out per module, by sampling
+(LOG_DEBUG_SAMPLE_RATES="mcp_client=0.1,server_connection=0") and by a
+per call site rate limit (LOG_DEBUG_RATE_LIMIT lines per second).
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+import atexit
+import json
 import logging
+import os
+import queue
+import random
 import sys
+import threading
+import time
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG").upper()
+LOG_FILE = os.getenv("LOG_FILE", "mcp_client.log")
+LOG_FILE_FORMAT = os.getenv("LOG_FILE_FORMAT", "json")
+LOG_CONSOLE_LEVEL = os.getenv("LOG_CONSOLE_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "4000"))
+LOG_DEBUG_SAMPLE_RATES = os.getenv("LOG_DEBUG_SAMPLE_RATES", "")
+LOG_DEBUG_RATE_LIMIT = float(os.getenv("LOG_DEBUG_RATE_LIMIT", "0"))
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+conversation_id: ContextVar[Optional[str]] = ContextVar("conversation_id", default=None)
+_context_vars = {"request_id": request_id, "conversation_id": conversation_id}
+
+
+@contextmanager
+def log_context(**ids):
+    """Adds `request_id` and/or `conversation_id` to records logged inside the block."""
+    tokens = [(_context_vars[name], _context_vars[name].set(value)) for name, value in ids.items()]
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            try:
+                var.reset(token)
+            except ValueError:
+                # Async generators may be closed from another context than they ran in
+                pass
+
+
+class ContextFilter(logging.Filter):
+    """Copies the bound IDs onto the record; must run in the logging thread, before the queue."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for name, var in _context_vars.items():
+            setattr(record, name, var.get())
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Keeps each DEBUG record of a module with that module's probability (1.0 when unlisted)."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    @staticmethod
+    def parse(spec: str) -> Dict[str, float]:
+        rates = {}
+        for item in spec.split(","):
+            module, _, rate = item.partition("=")
+            if module.strip() and rate.strip():
+                rates[module.strip()] = float(rate)
+        return rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = self.rates.get(record.module, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class DebugRateLimitFilter(logging.Filter):
+    """
+    Token bucket per call site (module and line) for DEBUG records.
+
+    The first record let through after some were dropped carries their
+    count as `suppressed`.
+    """
+
+    def __init__(self, per_second: float, burst: Optional[float] = None):
+        super().__init__()
+        self.per_second = per_second
+        self.burst = burst or max(1.0, per_second)
+        self._buckets: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        key = (record.module, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            # tokens, last refill, suppressed since the last record let through
+            bucket = self._buckets.setdefault(key, [self.burst, now, 0])
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.per_second)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            if bucket[2]:
+                record.suppressed = bucket[2]
+                bucket[2] = 0
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        for name in ("request_id", "conversation_id", "suppressed"):
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queues records without waiting; a full queue drops the record and counts it in `dropped`."""
+
+    def __init__(self, log_queue: queue.Queue, max_message_chars: int):
+        super().__init__(log_queue)
+        self.max_message_chars = max_message_chars
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve everything that depends on this thread or on live objects before queueing,
+        # and keep the exception text separate so the JSON formatter can give it its own field
+        message = record.getMessage()
+        if len(message) > self.max_message_chars:
+            message = f"{message[:self.max_message_chars]}... [{len(message) - self.max_message_chars} chars truncated]"
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = message
+        record.message = message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _build_handlers() -> list:
+    handlers = []
+    if LOG_FILE:
+        file_handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+        file_handler.setLevel(LOG_LEVEL)
+        file_handler.setFormatter(JsonFormatter() if LOG_FILE_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+        handlers.append(file_handler)
+
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(LOG_CONSOLE_LEVEL)
+    console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    handlers.append(console_handler)
+    return handlers
+
 
 logger = logging.getLogger("MCPClient")
-logger.setLevel(logging.DEBUG)
-
-file_handler = logging.FileHandler("mcp_client.log")
-file_handler.setLevel(logging.DEBUG)
-file_handler.setFormatter(
-    logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-)
-logger.addHandler(file_handler)
-
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(
-    logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-)
-logger.addHandler(console_handler)
\ No newline at end of file
+logger.setLevel(LOG_LEVEL)
+# Records are written by the listener's handlers only
+logger.propagate = False
+
+queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE), LOG_MAX_MESSAGE_CHARS)
+if LOG_DEBUG_SAMPLE_RATES:
+    queue_handler.addFilter(DebugSamplingFilter(DebugSamplingFilter.parse(LOG_DEBUG_SAMPLE_RATES)))
+if LOG_DEBUG_RATE_LIMIT > 0:
+    queue_handler.addFilter(DebugRateLimitFilter(LOG_DEBUG_RATE_LIMIT))
+queue_handler.addFilter(ContextFilter())
+logger.addHandler(queue_handler)
+
+listener = QueueListener(queue_handler.queue, *_build_handlers(), respect_handler_level=True)
+listener.start()
+atexit.register(listener.stop)
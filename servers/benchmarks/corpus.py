@@ -0,0 +1,199 @@
+import hashlib
+import html
+import random
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Subjects and shared vocabulary of the synthetic doc sets
+LIBRARIES = {
+    "azure_aks": {
+        "subjects": [
+            "Azure CNI overlay", "kubenet networking", "network policies", "ingress controllers",
+            "private clusters", "node pools", "cluster autoscaler", "upgrade channels",
+            "workload identity", "outbound egress types", "API server VNet integration",
+            "node resource reservations", "backup and restore", "pricing tiers",
+            "communication manager", "network isolated clusters",
+        ],
+        "vocabulary": [
+            "cluster", "node", "pod", "subnet", "virtual", "network", "azure", "kubernetes",
+            "configure", "resource", "group", "traffic", "address", "service", "load",
+            "balancer", "control", "plane", "upgrade", "version", "policy", "route", "dns",
+        ],
+    },
+    "blueprism": {
+        "subjects": [
+            "SAML authentication in Hub", "digital workers", "work queues", "credential manager",
+            "process studio", "object studio", "control room scheduling", "session variables",
+            "environment locking", "exception handling", "release manager", "application modeller",
+            "web API services", "login agent", "decipher IDP", "interactive client",
+        ],
+        "vocabulary": [
+            "process", "object", "robot", "runtime", "resource", "queue", "item", "session",
+            "hub", "blue", "prism", "user", "role", "permission", "schedule", "stage",
+            "action", "business", "data", "server", "client", "configure",
+        ],
+    },
+}
+
+SYLLABLES = ["ka", "lo", "mi", "ren", "sa", "tor", "vex", "qui", "dan", "pel", "zor", "bri", "nu", "fal", "gim", "hov"]
+
+QUESTION_TEMPLATES = [
+    "how do I configure {subject} with {a} and {b}",
+    "what is {a} in {subject}",
+    "{subject} {a} {b} troubleshooting",
+    "explain {b} for {subject}",
+]
+
+
+@dataclass
+class Page:
+    library: str
+    path: str
+    subject: str
+    keywords: list[str]
+    body: str
+    html: str = ""
+    url: str = ""
+
+
+@dataclass
+class Query:
+    library: str
+    text: str
+    relevant_path: str
+    relevant_url: str = ""
+
+
+@dataclass
+class Corpus:
+    pages: list[Page] = field(default_factory=list)
+    queries: list[Query] = field(default_factory=list)
+
+    def bind(self, base_url: str):
+        """Fills in page and query URLs once the fixture server is listening."""
+        for page in self.pages:
+            page.url = f"{base_url}{page.path}"
+        urls = {page.path: page.url for page in self.pages}
+        for query in self.queries:
+            query.relevant_url = urls[query.relevant_path]
+
+
+def _pseudo_word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+
+
+def _sentence(rng: random.Random, vocabulary: list[str], keywords: list[str]) -> str:
+    words = rng.sample(vocabulary, k=min(len(vocabulary), rng.randint(6, 12)))
+    for _ in range(rng.randint(0, 2)):
+        words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+    return " ".join(words).capitalize() + "."
+
+
+def _render(page: Page, vocabulary: list[str], rng: random.Random) -> str:
+    nav = "".join(f'<li><a href="#">{html.escape(word)}</a></li>' for word in rng.sample(vocabulary, 8))
+    return (
+        "<!DOCTYPE html><html><head>"
+        f"<title>{html.escape(page.subject)}</title>"
+        "<script>window.analytics = [];</script><style>body { font-family: sans-serif; }</style>"
+        "</head><body>"
+        f"<header><nav><ul>{nav}</ul></nav></header>"
+        f'<main><article><h1>{html.escape(page.subject)}</h1>{page.body}</article></main>'
+        '<aside class="feedback">Was this page helpful? Yes No</aside>'
+        "<footer>Privacy Terms of use Trademarks</footer>"
+        "</body></html>"
+    )
+
+
+def build_corpus(pages_per_library: int = 16, queries_per_page: int = 2, paragraphs: int = 8, seed: int = 0) -> Corpus:
+    """
+    Generates documentation-like HTML pages and queries with known answers.
+
+    Pages of one library share a vocabulary and differ by subject and a few
+    page-specific keywords, so queries need those keywords to find their
+    page. The same arguments always produce the same corpus.
+    """
+    rng = random.Random(seed)
+    corpus = Corpus()
+    used = set()
+    for library, spec in LIBRARIES.items():
+        vocabulary = spec["vocabulary"]
+        for index in range(pages_per_library):
+            subject = spec["subjects"][index % len(spec["subjects"])]
+            if index >= len(spec["subjects"]):
+                subject = f"{subject} part {index // len(spec['subjects']) + 1}"
+            keywords = []
+            while len(keywords) < 6:
+                word = _pseudo_word(rng)
+                if word not in used:
+                    used.add(word)
+                    keywords.append(word)
+
+            body = "".join(
+                "<p>" + " ".join(_sentence(rng, vocabulary, keywords) for _ in range(rng.randint(4, 8))) + "</p>"
+                for _ in range(paragraphs)
+            )
+            page = Page(library, f"/{library}/page-{index:03d}", subject, keywords, body)
+            page.html = _render(page, vocabulary, rng)
+            corpus.pages.append(page)
+
+            for template in rng.sample(QUESTION_TEMPLATES, k=min(queries_per_page, len(QUESTION_TEMPLATES))):
+                a, b = rng.sample(keywords, 2)
+                corpus.queries.append(Query(library, template.format(subject=subject.lower(), a=a, b=b), page.path))
+    return corpus
+
+
+@contextmanager
+def serve_corpus(corpus: Corpus):
+    """
+    Serves the corpus pages from a local HTTP server on a free port.
+
+    Responses carry ETag and Last-Modified headers and answer conditional
+    requests with 304, like the real docs sites.
+
+    Yields:
+        str: The server's base URL.
+    """
+    pages = {page.path: page.html.encode("utf-8") for page in corpus.pages}
+    last_modified = formatdate(0, usegmt=True)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            body = pages.get(self.path.split("?", 1)[0])
+            if body is None:
+                self.send_error(404)
+                return
+            etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="benchmark-fixture", daemon=True)
+    thread.start()
+    try:
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        corpus.bind(base_url)
+        yield base_url
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,41 @@
+import hashlib
+import math
+import re
+
+from langchain_core.embeddings import Embeddings
+
+
+_TOKEN = re.compile(r"\w+")
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic local stand-in for the Gemini embedding model.
+
+    Unigrams and bigrams are hashed into a fixed number of signed buckets
+    and the vector is L2-normalized, so texts sharing terms land close
+    together. Vectors are identical across runs and machines and no network
+    is needed, which keeps benchmark numbers comparable.
+    """
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> list[float]:
+        tokens = _TOKEN.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        vector = [0.0] * self.dimensions
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector))
+        if not norm:
+            return vector
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: list[str], **kwargs) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str, **kwargs) -> list[float]:
+        return self._embed(text)
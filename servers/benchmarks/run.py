@@ -0,0 +1,317 @@
+"""
+Offline benchmark of the docs server's retrieval and page pipelines.
+
+Run from the servers directory:
+
+    uv run python -m benchmarks.run --concurrency 8 --output benchmarks/results.json
+    uv run python -m benchmarks.run --baseline benchmarks/results.json
+
+Every page comes from a synthetic corpus served on localhost and every
+embedding from a deterministic hash function, so no network or API key
+is needed and two runs on the same machine are directly comparable.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Keep Chroma from phoning home; the benchmark must run without a network
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+SERVERS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The ingest CLI imports its neighbours as top-level modules
+sys.path.insert(0, os.path.join(SERVERS_DIR, "vectorstore"))
+
+import vectorestore
+from registry import VectorStoreRegistry
+from retrieval import HybridRetriever
+from cache import TwoLevelCache
+from embedding_cache import BatchingEmbedder
+from extract import extract_main_text
+from fanout import HostLimiter
+
+from benchmarks.corpus import build_corpus, serve_corpus
+from benchmarks.fake_embeddings import HashEmbeddings
+
+
+RESULTS_VERSION = 1
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float], wall_seconds: float) -> dict:
+    """Latency percentiles in milliseconds and operations per second."""
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+        "throughput_per_s": round(len(values) / wall_seconds, 3) if wall_seconds else 0.0,
+    }
+
+
+def bench_ingest(corpus, registry: VectorStoreRegistry, concurrency: int, batch_size: int) -> dict:
+    """Mirrors the ingest CLI: pages load in parallel, chunks are written as each page arrives."""
+    load_latencies, upload_latencies = [], []
+    chunks = 0
+    stores = {library: registry.store(library) for library in registry.libraries}
+
+    def timed_load(page):
+        start = time.perf_counter()
+        docs = vectorestore.load_website(page.url)
+        return docs, time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(timed_load, page): page for page in corpus.pages}
+        for future in as_completed(futures):
+            page = futures[future]
+            docs, load_seconds = future.result()
+            load_latencies.append(load_seconds)
+
+            start = time.perf_counter()
+            ids = vectorestore.upload_website_to_collection(
+                stores[page.library], page.library, page.url, docs,
+                vectorestore.content_hash(docs), None, batch_size,
+            )
+            upload_latencies.append(time.perf_counter() - start)
+            chunks += len(ids)
+    wall = time.perf_counter() - started
+
+    return {
+        "pages": len(corpus.pages),
+        "chunks": chunks,
+        "wall_s": round(wall, 3),
+        "chunks_per_s": round(chunks / wall, 3) if wall else 0.0,
+        "page_load": summarize(load_latencies, wall),
+        "page_upload": summarize(upload_latencies, wall),
+    }
+
+
+def _rank_metrics(ranked_urls: list[list[str]], relevant_urls: list[str], k: int) -> dict:
+    hits, reciprocal_ranks = 0, 0.0
+    for urls, relevant in zip(ranked_urls, relevant_urls):
+        if relevant in urls[:k]:
+            hits += 1
+            reciprocal_ranks += 1 / (urls.index(relevant) + 1)
+    count = len(relevant_urls) or 1
+    return {f"recall@{k}": round(hits / count, 4), "mrr": round(reciprocal_ranks / count, 4)}
+
+
+async def bench_search(corpus, registry: VectorStoreRegistry, cache_dir: str, k: int, concurrency: int, rounds: int) -> dict:
+    """
+    Runs every query through the search_vector_store path: cached, batched
+    query embedding, then hybrid or plain vector search off the event loop.
+    """
+    retrievers = {library: HybridRetriever(registry.store(library)) for library in registry.libraries}
+    for retriever in retrievers.values():
+        retriever.refresh()
+    registry.warm()
+
+    async def hybrid(query, embedding):
+        hits = await asyncio.to_thread(retrievers[query.library].search, query.text, embedding, k, None)
+        return [hit["metadata"].get("source_url") for hit in hits]
+
+    async def vector(query, embedding):
+        collection = registry.store(query.library)._collection
+        hits = await asyncio.to_thread(
+            collection.query, query_embeddings=[embedding], n_results=k, include=["metadatas"]
+        )
+        return [metadata.get("source_url") for metadata in hits["metadatas"][0]]
+
+    results = {}
+    for mode, search in (("hybrid", hybrid), ("vector", vector)):
+        cache = TwoLevelCache(os.path.join(cache_dir, f"embeddings-{mode}.sqlite3"))
+        embedder = BatchingEmbedder(registry.embeddings, "hash", cache)
+        limit = asyncio.Semaphore(concurrency)
+        latencies, ranked = [], []
+
+        async def one(query):
+            async with limit:
+                start = time.perf_counter()
+                embedding = await embedder.embed_query(query.text)
+                urls = await search(query, embedding)
+                latencies.append(time.perf_counter() - start)
+                return urls
+
+        round_summaries = []
+        started = time.perf_counter()
+        for _ in range(rounds):
+            round_started = time.perf_counter()
+            first = len(latencies)
+            ranked = await asyncio.gather(*(one(query) for query in corpus.queries))
+            round_summaries.append(summarize(latencies[first:], time.perf_counter() - round_started))
+        wall = time.perf_counter() - started
+        cache.close()
+
+        results[mode] = {
+            **_rank_metrics(ranked, [query.relevant_url for query in corpus.queries], k),
+            "latency": summarize(latencies, wall),
+            # The first round embeds every query; later rounds hit the embedding cache
+            "cold_round": round_summaries[0],
+            "embedding_cache": dict(cache.stats),
+        }
+    return results
+
+
+async def bench_fetch(corpus, fetcher: str, concurrency: int) -> dict:
+    """Fetches and extracts every page the way fetch_url does on a cache miss."""
+    limiter = HostLimiter(concurrency, concurrency)
+    fetch_latencies, extract_latencies, total_latencies = [], [], []
+    extracted = 0
+
+    if fetcher == "browser":
+        from browser_pool import BrowserPool
+
+        pool = BrowserPool(size=concurrency)
+        await pool.start()
+
+        async def fetch(url):
+            html, _ = await pool.fetch(url)
+            return html
+
+        close = pool.close
+    else:
+        import httpx
+
+        client = httpx.AsyncClient()
+
+        async def fetch(url):
+            response = await client.get(url)
+            response.raise_for_status()
+            return response.text
+
+        close = client.aclose
+
+    async def one(page):
+        nonlocal extracted
+        start = time.perf_counter()
+        async with limiter.limit(page.url):
+            html = await fetch(page.url)
+        fetched = time.perf_counter()
+        text = extract_main_text(html)
+        done = time.perf_counter()
+        fetch_latencies.append(fetched - start)
+        extract_latencies.append(done - fetched)
+        total_latencies.append(done - start)
+        # The heading and page keywords are article text; the nav and footer are not
+        if page.subject in text and all(keyword in text for keyword in page.keywords[:2]) and "Privacy" not in text:
+            extracted += 1
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(page) for page in corpus.pages))
+        wall = time.perf_counter() - started
+    finally:
+        await close()
+
+    return {
+        "fetcher": fetcher,
+        "pages": len(corpus.pages),
+        "extracted_ok": extracted,
+        "fetch": summarize(fetch_latencies, wall),
+        "extract": summarize(extract_latencies, wall),
+        "fetch_and_extract": summarize(total_latencies, wall),
+    }
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline: dict, current: dict):
+    """Prints every numeric result next to its baseline value and the relative change."""
+    old, new = flatten(baseline.get("results", {})), flatten(current["results"])
+    width = max((len(name) for name in new), default=10)
+    for name, value in new.items():
+        if name not in old:
+            print(f"{name:<{width}}  {'-':>12}  {value:>12}")
+            continue
+        change = f"{(value - old[name]) / old[name] * 100:+.1f}%" if old[name] else "n/a"
+        print(f"{name:<{width}}  {old[name]:>12}  {value:>12}  {change:>8}")
+
+
+async def run(args) -> dict:
+    corpus = build_corpus(args.pages_per_library, args.queries_per_page, seed=args.seed)
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir, serve_corpus(corpus):
+        registry = VectorStoreRegistry(
+            sorted({page.library for page in corpus.pages}),
+            HashEmbeddings(args.dimensions),
+            path=os.path.join(workdir, "chroma"),
+        )
+        results["ingest"] = await asyncio.to_thread(
+            bench_ingest, corpus, registry, args.concurrency, args.batch_size
+        )
+        results["search"] = await bench_search(corpus, registry, workdir, args.k, args.concurrency, args.rounds)
+        if args.fetcher != "none":
+            results["fetch"] = await bench_fetch(corpus, args.fetcher, args.concurrency)
+
+    return {
+        "version": RESULTS_VERSION,
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "baseline")
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark of vector search, ingestion and page fetch+extract")
+    parser.add_argument("--pages-per-library", type=int, default=16)
+    parser.add_argument("--queries-per-page", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0, help="corpus generator seed")
+    parser.add_argument("--dimensions", type=int, default=384, help="size of the stand-in embedding vectors")
+    parser.add_argument("-k", "--k", type=int, default=3, help="results per query")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight at once")
+    parser.add_argument("--rounds", type=int, default=3, help="passes over the query set")
+    parser.add_argument("--batch-size", type=int, default=64, help="chunks per vector store write")
+    parser.add_argument("--fetcher", choices=["browser", "http", "none"], default="browser",
+                        help="how pages are fetched before extraction; browser needs Playwright's Chromium installed")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.json"))
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        # Read first: the baseline may be the file this run overwrites
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+    report = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Results written to {args.output}")
+
+    if baseline is not None:
+        compare(baseline, report)
+    else:
+        for name, value in flatten(report["results"]).items():
+            print(f"{name}: {value}")
@@ -0,0 +1,129 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright, Error as PlaywrightError
+
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "4"))
+PAGE_LOAD_TIMEOUT_MS = int(os.getenv("PAGE_LOAD_TIMEOUT_MS", "15000"))
+PAGE_SETTLE_TIMEOUT_MS = int(os.getenv("PAGE_SETTLE_TIMEOUT_MS", "5000"))
+DOM_STABLE_INTERVAL_MS = int(os.getenv("DOM_STABLE_INTERVAL_MS", "250"))
+
+
+class BrowserPool:
+    """
+    A single long-lived headless Chromium shared by every tool call.
+
+    The browser is launched once and hands out a bounded number of
+    reusable pages (one per isolated context), so overlapping queries
+    queue for a free page instead of launching extra browsers.
+    """
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        load_timeout_ms: int = PAGE_LOAD_TIMEOUT_MS,
+        settle_timeout_ms: int = PAGE_SETTLE_TIMEOUT_MS,
+    ):
+        self.size = size
+        self.load_timeout_ms = load_timeout_ms
+        self.settle_timeout_ms = settle_timeout_ms
+        self._playwright = None
+        self._browser = None
+        self._slots = asyncio.Semaphore(size)
+        self._idle_pages = []
+        self._start_lock = asyncio.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    async def start(self):
+        async with self._start_lock:
+            if self.started:
+                return
+            await self._close_browser()
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+
+    async def _acquire_page(self):
+        if not self.started:
+            await self.start()
+        while self._idle_pages:
+            page = self._idle_pages.pop()
+            if not page.is_closed():
+                return page
+        context = await self._browser.new_context()
+        return await context.new_page()
+
+    async def _discard_page(self, page):
+        try:
+            await page.context.close()
+        except PlaywrightError:
+            pass
+
+    @asynccontextmanager
+    async def page(self):
+        """Borrows a page, waiting while all `size` pages are in use."""
+        async with self._slots:
+            page = await self._acquire_page()
+            healthy = False
+            try:
+                yield page
+                healthy = True
+            finally:
+                if healthy and self.started and not page.is_closed():
+                    self._idle_pages.append(page)
+                else:
+                    await self._discard_page(page)
+
+    async def fetch(self, url: str) -> tuple[str, dict]:
+        """
+        Loads the URL on a pooled page.
+
+        Readiness is network-idle, falling back to a stable DOM size once
+        the settle timeout expires, rather than a fixed sleep.
+
+        Returns:
+            tuple: The rendered HTML and the main document's response headers.
+        """
+        async with self.page() as page:
+            response = await page.goto(url, wait_until="domcontentloaded", timeout=self.load_timeout_ms)
+            headers = response.headers if response is not None else {}
+            try:
+                await page.wait_for_load_state("networkidle", timeout=self.settle_timeout_ms)
+            except PlaywrightError:
+                await self._wait_for_dom_stable(page)
+            content = await page.content()
+            await page.goto("about:blank")
+            return content, headers
+
+    async def _wait_for_dom_stable(self, page):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.settle_timeout_ms / 1000
+        previous = -1
+        while loop.time() < deadline:
+            current = await page.evaluate("document.body ? document.body.innerHTML.length : 0")
+            if current == previous:
+                return
+            previous = current
+            await asyncio.sleep(DOM_STABLE_INTERVAL_MS / 1000)
+
+    async def _close_browser(self):
+        pages, self._idle_pages = self._idle_pages, []
+        for page in pages:
+            await self._discard_page(page)
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except PlaywrightError:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def close(self):
+        async with self._start_lock:
+            await self._close_browser()
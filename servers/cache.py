@@ -0,0 +1,163 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    expires_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def revalidatable(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+
+def normalize_key(*parts: str) -> str:
+    """Lowercases and collapses whitespace so trivially different queries share a key."""
+    return "|".join(" ".join(str(part).lower().split()) for part in parts)
+
+
+class TwoLevelCache:
+    """
+    In-memory LRU in front of a compressed SQLite store.
+
+    Entries carry a TTL plus optional ETag/Last-Modified validators. Expired
+    entries with validators are kept on disk so callers can revalidate them
+    instead of refetching. The disk store is trimmed, least recently used
+    first, once it grows past `max_disk_bytes`.
+    """
+
+    def __init__(self, path: str, max_memory_items: int = 256, max_disk_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stale": 0, "revalidated": 0}
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+        self._db.commit()
+
+    # memory level
+
+    def _remember(self, key: str, entry: CacheEntry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    # disk level (called from worker threads)
+
+    def _disk_get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at, etag, last_modified FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        value, expires_at, etag, last_modified = row
+        return CacheEntry(json.loads(zlib.decompress(value)), expires_at, etag, last_modified)
+
+    def _disk_set(self, key: str, entry: CacheEntry):
+        blob = zlib.compress(json.dumps(entry.value).encode("utf-8"))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, blob, len(blob), entry.expires_at, entry.etag, entry.last_modified, time.time()),
+            )
+            self._evict()
+            self._db.commit()
+
+    def _disk_touch(self, key: str, expires_at: float):
+        with self._lock:
+            self._db.execute(
+                "UPDATE entries SET expires_at = ?, accessed_at = ? WHERE key = ?",
+                (expires_at, time.time(), key),
+            )
+            self._db.commit()
+
+    def _evict(self):
+        now = time.time()
+        # Expired entries without validators can never be reused
+        self._db.execute(
+            "DELETE FROM entries WHERE expires_at < ? AND etag IS NULL AND last_modified IS NULL", (now,)
+        )
+        (total,) = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if total <= self.max_disk_bytes:
+            return
+        rows = self._db.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+
+    # public api
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        """
+        Returns the entry for `key`, fresh or stale, or None on a miss.
+
+        Callers should check `entry.fresh` and revalidate stale entries.
+        """
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+        else:
+            entry = await asyncio.to_thread(self._disk_get, key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            self._remember(key, entry)
+        if not entry.fresh:
+            self.stats["stale"] += 1
+        return entry
+
+    async def set(self, key: str, value: Any, ttl: float, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        entry = CacheEntry(value, time.time() + ttl, etag, last_modified)
+        self._remember(key, entry)
+        await asyncio.to_thread(self._disk_set, key, entry)
+
+    async def refresh(self, key: str, entry: CacheEntry, ttl: float):
+        """Extends a stale entry after the origin confirmed it is unchanged."""
+        entry.expires_at = time.time() + ttl
+        self.stats["revalidated"] += 1
+        self._remember(key, entry)
+        await asyncio.to_thread(self._disk_touch, key, entry.expires_at)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
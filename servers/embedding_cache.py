@@ -0,0 +1,112 @@
+import asyncio
+import os
+
+from cache import TwoLevelCache, normalize_key
+
+
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", str(30 * 24 * 3600)))
+EMBEDDING_BATCH_WINDOW_MS = int(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "10"))
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "100"))
+
+
+class BatchingEmbedder:
+    """
+    Cached, micro-batched query embedding on top of a LangChain embeddings client.
+
+    Queries that arrive within `batch_window_ms` of each other are sent as a
+    single `embed_documents` call on a worker thread, so the event loop never
+    waits on the remote API. Vectors are cached by model and normalized text,
+    and a query whose embedding is already being computed waits for it.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        model: str,
+        cache: TwoLevelCache,
+        task_type: str = "retrieval_query",
+        batch_window_ms: int = EMBEDDING_BATCH_WINDOW_MS,
+        max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE,
+    ):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache
+        self.task_type = task_type
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._pending: dict[str, tuple[str, asyncio.Future]] = {}
+        # Keys of the batches being embedded right now
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._flush_handle = None
+        self._flush_tasks = set()
+
+    def _key(self, text: str) -> str:
+        return normalize_key("embedding", self.model, self.task_type, text)
+
+    async def embed_query(self, text: str) -> list[float]:
+        key = self._key(text)
+        entry = await self.cache.get(key)
+        if entry is not None and entry.fresh:
+            return entry.value
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            future = pending[1]
+        elif key in self._inflight:
+            future = self._inflight[key]
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[key] = (text, future)
+            if len(self._pending) >= self.max_batch_size:
+                self._schedule_flush(0)
+            else:
+                self._schedule_flush(self.batch_window)
+        return await asyncio.shield(future)
+
+    def _schedule_flush(self, delay: float):
+        if self._flush_handle is not None:
+            if delay > 0:
+                return
+            self._flush_handle.cancel()
+        loop = asyncio.get_running_loop()
+        self._flush_handle = loop.call_later(delay, self._start_flush)
+
+    def _start_flush(self):
+        self._flush_handle = None
+        # Keep a reference so a running flush is not garbage collected
+        task = asyncio.get_running_loop().create_task(self._flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush(self):
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        self._inflight.update((key, future) for key, (_, future) in batch.items())
+        try:
+            await self._embed_batch(batch)
+        finally:
+            for key, (_, future) in batch.items():
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+
+    async def _embed_batch(self, batch: dict):
+        keys = list(batch)
+        texts = [batch[key][0] for key in keys]
+        try:
+            vectors = await asyncio.to_thread(
+                self.embeddings.embed_documents, texts, task_type=self.task_type
+            )
+        except Exception as e:
+            for _, future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        vectors = [list(vector) for vector in vectors]
+        for key, vector in zip(keys, vectors):
+            future = batch[key][1]
+            if not future.done():
+                future.set_result(vector)
+        for key, vector in zip(keys, vectors):
+            await self.cache.set(key, vector, EMBEDDING_CACHE_TTL)
@@ -0,0 +1,77 @@
+import re
+
+from bs4 import BeautifulSoup
+
+
+# Tried in order; the first match is taken as the article body.
+# learn.microsoft.com uses <main id="main">, docs.blueprism.com wraps topics in <article>.
+MAIN_CONTENT_SELECTORS = [
+    "main article",
+    "main",
+    "article",
+    "[role=main]",
+    "#main-content",
+    "#content",
+]
+
+BOILERPLATE_TAGS = [
+    "script", "style", "noscript", "template", "svg", "iframe",
+    "nav", "footer", "aside", "form", "button",
+]
+
+BOILERPLATE_SELECTORS = [
+    "[role=navigation]",
+    "[role=banner]",
+    "[role=contentinfo]",
+    "[aria-hidden=true]",
+    ".feedback-section",
+    ".breadcrumb",
+]
+
+_INLINE_WHITESPACE = re.compile(r"[ \t\r\f\v\u00a0]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def extract_main_text(html: str) -> str:
+    """
+    Extracts readable article text from a rendered docs page.
+
+    Navigation, headers, footers and scripts are dropped, only the main
+    content region is kept when one can be found, and whitespace is collapsed.
+
+    Args:
+        html (str): Full page HTML.
+
+    Returns:
+        str: Cleaned article text.
+    """
+    soup = BeautifulSoup(html, "lxml")
+
+    root = None
+    for selector in MAIN_CONTENT_SELECTORS:
+        root = soup.select_one(selector)
+        if root is not None:
+            break
+    if root is None:
+        root = soup.body or soup
+
+    for tag in root.find_all(BOILERPLATE_TAGS):
+        tag.decompose()
+    for selector in BOILERPLATE_SELECTORS:
+        for tag in root.select(selector):
+            tag.decompose()
+
+    text = root.get_text("\n")
+    lines = (_INLINE_WHITESPACE.sub(" ", line).strip() for line in text.split("\n"))
+    text = "\n".join(lines)
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def truncate_text(text: str, max_chars: int) -> str:
+    """Cuts text to at most `max_chars`, on a word boundary where possible."""
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    if cut < max_chars // 2:
+        cut = max_chars
+    return text[:cut].rstrip() + " …[truncated]"
@@ -0,0 +1,44 @@
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+
+class HostLimiter:
+    """
+    Caps concurrent work both globally and per host.
+
+    A slot is taken from the host semaphore first so that requests queued
+    behind a busy host do not hold on to global slots other hosts could use.
+    """
+
+    def __init__(self, max_total: int, max_per_host: int):
+        self._total = asyncio.Semaphore(max_total)
+        self._hosts = defaultdict(lambda: asyncio.Semaphore(max_per_host))
+
+    @asynccontextmanager
+    async def limit(self, url: str):
+        host = urlparse(url).netloc.lower()
+        async with self._hosts[host]:
+            async with self._total:
+                yield
+
+
+async def gather_with_deadline(coros: dict, deadline: float) -> dict:
+    """
+    Runs the coroutines concurrently, each bounded by `deadline` seconds.
+
+    Args:
+        coros (dict): Mapping of key to coroutine.
+        deadline (float): Per-coroutine timeout in seconds.
+
+    Returns:
+        dict: Mapping of key to result, or to the raised exception
+        (`asyncio.TimeoutError` for coroutines that missed the deadline).
+    """
+    keys = list(coros)
+    results = await asyncio.gather(
+        *(asyncio.wait_for(coros[key], timeout=deadline) for key in keys),
+        return_exceptions=True,
+    )
+    return dict(zip(keys, results))
@@ -0,0 +1,87 @@
+import asyncio
+import importlib.util
+import os
+import random
+from typing import Optional
+
+import httpx
+
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))
+HTTP_RETRY_BACKOFF_MAX = float(os.getenv("HTTP_RETRY_BACKOFF_MAX", "8"))
+
+# HTTP/2 needs the optional h2 package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class HttpClient:
+    """
+    One pooled `httpx.AsyncClient` shared by every tool call in the process.
+
+    Connections are kept alive and reused, over HTTP/2 where the server and
+    the h2 package allow. `request` retries connection errors, timeouts and
+    429/502/503/504 responses with jittered exponential backoff, honouring
+    Retry-After. The client is created on first use, inside the running
+    event loop, and closed by `close`.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        retries: int = HTTP_RETRIES,
+        backoff: float = HTTP_RETRY_BACKOFF,
+        backoff_max: float = HTTP_RETRY_BACKOFF_MAX,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=self.limits,
+                timeout=httpx.Timeout(30, connect=10),
+                follow_redirects=True,
+            )
+        return self._client
+
+    def _delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        return min(self.backoff * 2 ** attempt, self.backoff_max) * random.uniform(0.5, 1.0)
+
+    async def request(self, method: str, url: str, retries: Optional[int] = None, **kwargs) -> httpx.Response:
+        """Sends a request, retrying transient failures. Other errors and the last failure are raised."""
+        retries = self.retries if retries is None else retries
+        for attempt in range(retries + 1):
+            response = None
+            try:
+                response = await self.client.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    return response
+            except (httpx.TransportError, httpx.TimeoutException):
+                if attempt == retries:
+                    raise
+            await asyncio.sleep(self._delay(attempt, response))
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
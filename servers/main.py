@@ -1,64 +1,221 @@
 from mcp.server.fastmcp import FastMCP
+from mcp.server.transport_security import TransportSecuritySettings
 from dotenv import load_dotenv
 import httpx
 import json
 import os
-from bs4 import BeautifulSoup
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-import os
-from langchain_chroma import Chroma
 import asyncio
-from playwright.async_api import async_playwright
-
+import argparse
+from contextlib import asynccontextmanager
 
+# Load settings before the local modules below read them at import time
 load_dotenv(os.path.join(os.path.dirname(__file__), '.env'), override=True)
 
-mcp = FastMCP("docs")
+from browser_pool import BrowserPool
+from fanout import HostLimiter, gather_with_deadline
+from cache import TwoLevelCache, CacheEntry, normalize_key
+from extract import extract_main_text, truncate_text
+from embedding_cache import BatchingEmbedder
+from singleflight import SingleFlight
+from http_client import HttpClient
+from tracing import Tracer
+from vectorstore.retrieval import HybridRetriever
+from vectorstore.registry import MANIFEST_PATH, VectorStoreRegistry, EMBEDDING_MODEL, get_embeddings
+
+http = HttpClient()
+
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", str(24 * 3600)))
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", str(6 * 3600)))
+
+# Built by docs_resources in the process that serves requests, not at import
+# time: with several workers, uvicorn's parent process only imports this
+# module to find the app, and each worker imports it again.
+tracer = Tracer()
+browser_pool: BrowserPool | None = None
+docs_cache: TwoLevelCache | None = None
+embedding_cache: TwoLevelCache | None = None
+query_embedder: BatchingEmbedder | None = None
+vector_stores: VectorStoreRegistry | None = None
+retrievers: dict[str, HybridRetriever] = {}
+
+def open_vector_stores():
+    """Opens every library's collection and loads its vector and keyword indexes before the first query."""
+    global embedding_cache, query_embedder, vector_stores, retrievers
+    embeddings = get_embeddings(EMBEDDING_MODEL)
+    embedding_cache = TwoLevelCache(
+        os.getenv("EMBEDDING_CACHE_PATH") or os.path.join(os.path.dirname(__file__), ".cache", "embeddings.sqlite3"),
+        max_memory_items=int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "1024")),
+    )
+    query_embedder = BatchingEmbedder(embeddings, EMBEDDING_MODEL, embedding_cache)
+    vector_stores = VectorStoreRegistry(docs_urls, embeddings)
+    vector_stores.warm()
+    retrievers = {
+        library: HybridRetriever(vector_stores.store(library), manifest_path=MANIFEST_PATH) for library in docs_urls
+    }
+    for retriever in retrievers.values():
+        retriever.refresh()
+
+@asynccontextmanager
+async def docs_resources():
+    """Process-wide resources: the tracer, the shared browser, the HTTP client, the vector stores and the on-disk caches."""
+    global tracer, browser_pool, docs_cache
+    tracer = Tracer.from_env("docs-server")
+    browser_pool = BrowserPool()
+    try:
+        docs_cache = TwoLevelCache(
+            os.getenv("DOCS_CACHE_PATH") or os.path.join(os.path.dirname(__file__), ".cache", "docs_cache.sqlite3"),
+            max_memory_items=int(os.getenv("DOCS_CACHE_MEMORY_ITEMS", "256")),
+            max_disk_bytes=int(os.getenv("DOCS_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+        )
+        await asyncio.to_thread(open_vector_stores)
+        await browser_pool.start()
+        yield
+    finally:
+        await browser_pool.close()
+        await http.close()
+        for cache in (docs_cache, embedding_cache):
+            if cache is not None:
+                cache.close()
+        tracer.close()
+
+# Set by create_http_app: over HTTP the server lifespan runs once per MCP
+# session, so the web app's lifespan owns the resources instead.
+serving_http = False
+
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    if serving_http:
+        yield
+        return
+    async with docs_resources():
+        yield
+
+def transport_security() -> TransportSecuritySettings | None:
+    """
+    Host headers accepted over HTTP, from DOCS_MCP_ALLOWED_HOSTS ("docs.internal:*,10.0.0.5:8001").
+
+    When unset, FastMCP decides from the bind host: only localhost names are
+    accepted on 127.0.0.1, and any host is accepted on 0.0.0.0.
+    """
+    allowed_hosts = [host.strip() for host in os.getenv("DOCS_MCP_ALLOWED_HOSTS", "").split(",") if host.strip()]
+    if not allowed_hosts:
+        return None
+    return TransportSecuritySettings(
+        enable_dns_rebinding_protection=True,
+        allowed_hosts=allowed_hosts,
+        allowed_origins=[f"{scheme}://{host}" for host in allowed_hosts for scheme in ("http", "https")],
+    )
+
+# The bind host decides FastMCP's DNS rebinding protection, so it must match
+# the one uvicorn listens on; workers re-import this module and read it from the environment.
+mcp = FastMCP(
+    "docs",
+    lifespan=lifespan,
+    host=os.getenv("DOCS_MCP_HOST", "127.0.0.1"),
+    transport_security=transport_security(),
+)
 
 SERPER_URL="https://google.serper.dev/search"
 
+MAX_RESULTS = int(os.getenv("MAX_RESULTS", "10"))
+MAX_CONCURRENT_FETCHES = int(os.getenv("MAX_CONCURRENT_FETCHES", "8"))
+MAX_FETCHES_PER_HOST = int(os.getenv("MAX_FETCHES_PER_HOST", "4"))
+PAGE_DEADLINE_SECONDS = float(os.getenv("PAGE_DEADLINE_SECONDS", "20"))
+MAX_CHARS_PER_RESULT = int(os.getenv("MAX_CHARS_PER_RESULT", "8000"))
+
+fetch_limiter = HostLimiter(MAX_CONCURRENT_FETCHES, MAX_FETCHES_PER_HOST)
+# Identical searches, page fetches and vector searches already running are joined, not repeated
+inflight = SingleFlight()
+
 docs_urls = {
     "azure_aks": "learn.microsoft.com/en-us/azure/aks",
     "blueprism": "docs.blueprism.com/en-US",
 }
 
-async def search_web(query: str) -> dict | None:
-    payload = json.dumps({"q": query, "num": 1})
+def request_traceparent() -> str | None:
+    """The caller's trace context, sent by the MCP client in the request's _meta."""
+    try:
+        meta = mcp.get_context().request_context.meta
+    except (ValueError, LookupError):
+        return None
+    return getattr(meta, "traceparent", None)
+
+async def search_web(query: str, num: int = 1) -> dict | None:
+    payload = json.dumps({"q": query, "num": num})
 
     headers = {
         "X-API-KEY": os.getenv("SERPER_API_KEY"),
         "Content-Type": "application/json",
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                SERPER_URL, headers=headers, data=payload, timeout=30
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.TimeoutException:
-            return {"organic": []}
+    try:
+        response = await http.request("POST", SERPER_URL, headers=headers, content=payload, timeout=30)
+        response.raise_for_status()
+        return response.json()
+    except httpx.TimeoutException:
+        return {"organic": []}
+
+async def cached_search(query: str, library: str, num: int) -> dict:
+    with tracer.span("search", {"library": library}) as span:
+        key = normalize_key("search", library, query, str(num))
+        entry = await docs_cache.get(key)
+        span.set_attribute("cache", "hit" if entry is not None and entry.fresh else "miss")
+        if entry is not None and entry.fresh:
+            return entry.value
+
+        results = await search_web(f"site:{docs_urls[library]} {query}", num=num)
+        span.set_attribute("results", len(results.get("organic", [])))
+        if results.get("organic"):
+            await docs_cache.set(key, results, SEARCH_CACHE_TTL)
+        return results
+
+async def is_unchanged(url: str, entry: CacheEntry) -> bool:
+    """Asks the origin whether a stale cached page is still current."""
+    headers = {}
+    if entry.etag:
+        headers["If-None-Match"] = entry.etag
+    if entry.last_modified:
+        headers["If-Modified-Since"] = entry.last_modified
 
-async def fetch_url(url: str):
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
-            await page.goto(url)
-            await page.wait_for_selector("body")
-            await asyncio.sleep(30)
-            page_content = await page.content()
-            await browser.close()
-            soup = BeautifulSoup(page_content, "html.parser")
-            text = soup.get_text()
+        # A failed check just means refetching the page, so do not retry
+        response = await http.request("GET", url, retries=0, headers=headers, timeout=10)
+        return response.status_code == 304
+    except httpx.HTTPError:
+        return False
+
+async def fetch_url(url: str):
+    with tracer.span("fetch_url", {"url": url}) as span:
+        key = f"article|{url}"
+        entry = await docs_cache.get(key)
+        if entry is not None:
+            if entry.fresh:
+                span.set_attribute("cache", "hit")
+                return entry.value
+            if entry.revalidatable and await is_unchanged(url, entry):
+                span.set_attribute("cache", "revalidated")
+                await docs_cache.refresh(key, entry, PAGE_CACHE_TTL)
+                return entry.value
+        span.set_attribute("cache", "miss")
+
+        try:
+            with tracer.span("browser_fetch"):
+                async with fetch_limiter.limit(url):
+                    page_content, headers = await browser_pool.fetch(url)
+            with tracer.span("extract", {"html_chars": len(page_content)}):
+                text = extract_main_text(page_content)
+            await docs_cache.set(
+                key, text, PAGE_CACHE_TTL,
+                etag=headers.get("etag"), last_modified=headers.get("last-modified"),
+            )
             return text
 
-    except Exception as e:
-        return f"An error occurred: {str(e)}"
+        except Exception as e:
+            span.record_error(e)
+            return f"An error occurred: {str(e)}"
 
 @mcp.tool()
-async def get_docs(query: str, library: str):
+async def get_docs(query: str, library: str, num_results: int = 3) -> list[str]:
   """
   Search the latest docs for a given query and library.
   Supports aks and blueprism.
@@ -66,56 +223,141 @@ async def get_docs(query: str, library: str):
   Args:
     query: The query to search for (e.g. "saml authentication in blueprism Hub 5.1")
     library: The library to search in (e.g. "blueprism")
+    num_results: Number of result pages to fetch (1-10)
 
   Returns:
-    Text from the docs
+    Main article text from the docs, one size-capped chunk per result page
   """
   if library not in docs_urls:
     raise ValueError(f"Library {library} not supported by this tool")
 
-  query = f"site:{docs_urls[library]} {query}"
-  results = await search_web(query)
-  if len(results["organic"]) == 0:
-    return "No results found"
-
-  text = ""
-  for result in results["organic"]:
-    text += await fetch_url(result["link"])
-  return text
-
-
-embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
-collectionName="aks_networking"
-current_file_path = os.path.abspath(__file__)
-current_directory = os.path.dirname(current_file_path)
-embeddings_persistent_directory= os.path.join(current_directory, "vectorstore\\vectors\\")
-vector_store = Chroma(
-    collection_name=collectionName,
-    embedding_function=embeddings,
-    persist_directory=f"{embeddings_persistent_directory}\\chroma_langchain_db"
-)
+  attributes = {"library": library, "num_results": num_results}
+  with tracer.span("get_docs", attributes, traceparent=request_traceparent(), kind="SERVER") as span:
+    num_results = max(1, min(num_results, MAX_RESULTS))
+    results = await inflight.do(
+      normalize_key("search", library, query, str(num_results)), cached_search, query, library, num_results
+    )
+    if len(results["organic"]) == 0:
+      return ["No results found"]
+
+    # Fetch every result page at once; slow pages are dropped at the deadline
+    links = list(dict.fromkeys(result["link"] for result in results["organic"][:num_results]))
+    pages = await gather_with_deadline(
+      {link: inflight.do(f"article|{link}", fetch_url, link) for link in links}, PAGE_DEADLINE_SECONDS
+    )
+
+    sections = []
+    for link, page in pages.items():
+      if isinstance(page, asyncio.TimeoutError):
+        sections.append(f"Source: {link}\nSkipped: page did not load within {PAGE_DEADLINE_SECONDS:g}s")
+      elif isinstance(page, Exception):
+        sections.append(f"Source: {link}\nAn error occurred: {str(page)}")
+      else:
+        sections.append(f"Source: {link}\n{truncate_text(page, MAX_CHARS_PER_RESULT)}")
+    span.set_attribute("pages_skipped", sum(isinstance(page, Exception) for page in pages.values()))
+    return sections
+
+
+@mcp.resource("cache://stats")
+def cache_stats() -> str:
+  """Hit/miss counters for the search and page cache and the embedding cache, and counts of coalesced calls"""
+  return json.dumps({
+    "docs": docs_cache.stats if docs_cache is not None else {},
+    "embeddings": embedding_cache.stats if embedding_cache is not None else {},
+    "inflight": inflight.stats,
+  })
+
+
+MAX_VECTOR_RESULTS = int(os.getenv("MAX_VECTOR_RESULTS", "10"))
 
 
 
+async def hybrid_search(library: str, query: str, k: int, where: dict | None) -> list[dict]:
+    with tracer.span("embed_query"):
+        query_embedding = await query_embedder.embed_query(query)
+    with tracer.span("hybrid_retrieve", {"library": library, "k": k}):
+        return await asyncio.to_thread(retrievers[library].search, query, query_embedding, k, where)
+
+
 @mcp.tool()
-async def search_vector_store(query: str,):
+async def search_vector_store(query: str, library: str = "azure_aks", k: int = 3, source_url: str | None = None) -> list[str]:
   """
   Search the internal vector store knowledge base to answer the user's question.
-  The vector store currently has knowledge about Azure AKS Networking.Please use other available tools to answer questions not related to Azure AKS networking.
-  If no answer is found in the vector store about Azure AKS Networking, simply respond to the user with the answer "Not found in knowledge base".
+  The knowledge base has one collection per library; azure_aks currently holds Azure AKS Networking docs.
+  Please use other available tools to answer questions the knowledge base does not cover.
+  If no answer is found in the vector store, simply respond to the user with the answer "Not found in knowledge base".
   Please do not answer the question using your own knowledge about the topic
 
   Args:
     query: The query to search for (e.g. "what is Azure CNI?")
+    library: The library collection to search (e.g. "azure_aks")
+    k: Number of chunks to return (1-10)
+    source_url: Only search chunks taken from this documentation page
 
   Returns:
-    top 3 similarity vector search results from the vector store knowledge base
+    top k results from hybrid keyword and vector search of the knowledge base, with scores
   """
-  query_embedding = embeddings.embed_query(query)
-  results = vector_store.similarity_search_by_vector(query_embedding, k=3)
-  for doc in results:
-    return(f"* {doc.page_content} [{doc.metadata}]")
+  if library not in docs_urls:
+    raise ValueError(f"Library {library} not supported by this tool")
+
+  k = max(1, min(k, MAX_VECTOR_RESULTS))
+  where = {"source_url": source_url} if source_url else None
+  with tracer.span("search_vector_store", {"library": library, "k": k}, traceparent=request_traceparent(), kind="SERVER") as span:
+    # URL paths are case-sensitive, so the filter is kept out of the normalized part of the key
+    key = f'{normalize_key("vector", library, query, str(k))}|{source_url or ""}'
+    results = await inflight.do(key, hybrid_search, library, query, k, where)
+    span.set_attribute("results", len(results))
+  if not results:
+    return ["Not found in knowledge base"]
+  return [
+    f"* {result['content']} [{result['metadata']}] (score={result['score']})"
+    for result in results
+  ]
+
+
+def create_http_app():
+    """Streamable HTTP app that starts the docs resources once per worker process."""
+    global serving_http
+    serving_http = True
+    app = mcp.streamable_http_app()
+    session_manager_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def app_lifespan(app):
+        async with session_manager_lifespan(app):
+            async with docs_resources():
+                yield
+
+    app.router.lifespan_context = app_lifespan
+    return app
 
 
 if __name__ == "__main__":
-     mcp.run(transport="stdio")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="docs MCP server")
+    parser.add_argument("--transport", choices=["stdio", "streamable-http"], default=os.getenv("DOCS_MCP_TRANSPORT", "stdio"))
+    parser.add_argument("--host", default=os.getenv("DOCS_MCP_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("DOCS_MCP_PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("DOCS_MCP_WORKERS", "1")))
+    parser.add_argument("--graceful-shutdown-timeout", type=int, default=int(os.getenv("DOCS_MCP_GRACEFUL_SHUTDOWN_TIMEOUT", "30")))
+    args = parser.parse_args()
+
+    if args.transport == "stdio":
+        mcp.run(transport="stdio")
+    else:
+        import uvicorn
+
+        # Worker processes import this module afresh and inherit these settings.
+        os.environ["DOCS_MCP_HOST"] = args.host
+        if args.workers > 1:
+            # Requests of one client may land on any worker, so keep no per-session state
+            os.environ["FASTMCP_STATELESS_HTTP"] = "true"
+
+        uvicorn.run(
+            "main:create_http_app",
+            factory=True,
+            app_dir=os.path.dirname(os.path.abspath(__file__)),
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            timeout_graceful_shutdown=args.graceful_shutdown_timeout,
+        )
\ No newline at end of file
@@ -0,0 +1,48 @@
+import importlib
+import sys
+
+import pytest
+
+pytest.importorskip("mcp")
+testclient = pytest.importorskip("starlette.testclient")
+
+INITIALIZE = {
+    "jsonrpc": "2.0",
+    "id": 1,
+    "method": "initialize",
+    "params": {
+        "protocolVersion": "2025-03-26",
+        "capabilities": {},
+        "clientInfo": {"name": "test", "version": "0"},
+    },
+}
+HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+
+
+def load_main(monkeypatch, **env):
+    """Imports the server module afresh, as each uvicorn worker does, with the given settings."""
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.delitem(sys.modules, "main", raising=False)
+    main = importlib.import_module("main")
+    # Only the MCP transport is under test, not the docs resources
+    monkeypatch.setattr(main, "serving_http", True)
+    return main
+
+
+def initialize(main, *hosts: str) -> list[int]:
+    """Status of an initialize request sent with each Host header."""
+    with testclient.TestClient(main.mcp.streamable_http_app()) as client:
+        return [
+            client.post("/mcp", json=INITIALIZE, headers={**HEADERS, "Host": host}).status_code for host in hosts
+        ]
+
+
+def test_server_bound_to_all_interfaces_accepts_any_host(monkeypatch):
+    main = load_main(monkeypatch, DOCS_MCP_HOST="0.0.0.0", DOCS_MCP_ALLOWED_HOSTS="")
+    assert initialize(main, "docs.internal:8001") == [200]
+
+
+def test_allowed_hosts_are_accepted_and_others_rejected(monkeypatch):
+    main = load_main(monkeypatch, DOCS_MCP_HOST="127.0.0.1", DOCS_MCP_ALLOWED_HOSTS="docs.internal:*")
+    assert initialize(main, "docs.internal:8001", "evil.example:8001") == [200, 421]
@@ -0,0 +1,79 @@
+from functools import lru_cache
+import os
+
+import chromadb
+from langchain_chroma import Chroma
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+
+EMBEDDING_MODEL = "models/text-embedding-004"
+
+PERSIST_DIRECTORY = os.getenv("VECTORSTORE_PATH") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "vectors", "chroma_langchain_db"
+)
+
+# Written by vectorestore.py after every page it ingests
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingest_manifest.json")
+
+# Collection per library; azure_aks keeps the name it was first ingested under
+COLLECTIONS = {
+    "azure_aks": "aks_networking",
+    "blueprism": "blueprism",
+}
+
+
+def collection_name(library: str) -> str:
+    return COLLECTIONS.get(library, library)
+
+
+@lru_cache(maxsize=None)
+def get_embeddings(model: str = EMBEDDING_MODEL) -> GoogleGenerativeAIEmbeddings:
+    return GoogleGenerativeAIEmbeddings(model=model)
+
+
+@lru_cache(maxsize=None)
+def get_client(path: str = PERSIST_DIRECTORY):
+    """One persistent Chroma client per path and process."""
+    os.makedirs(path, exist_ok=True)
+    return chromadb.PersistentClient(path=path)
+
+
+class VectorStoreRegistry:
+    """
+    Named Chroma collections, one per library, on a single shared client.
+
+    Stores are created on first use and kept for the life of the process.
+    `warm` loads each collection's HNSW index ahead of the first query.
+    Methods block and should be called off the event loop.
+    """
+
+    def __init__(self, libraries, embeddings=None, path: str = PERSIST_DIRECTORY):
+        self.libraries = list(libraries)
+        self.embeddings = embeddings or get_embeddings()
+        self.client = get_client(path)
+        self._stores: dict[str, Chroma] = {}
+
+    def __contains__(self, library: str) -> bool:
+        return library in self.libraries
+
+    def store(self, library: str) -> Chroma:
+        if library not in self.libraries:
+            raise ValueError(f"Library {library} has no vector store collection")
+        store = self._stores.get(library)
+        if store is None:
+            store = Chroma(
+                client=self.client,
+                collection_name=collection_name(library),
+                embedding_function=self.embeddings,
+            )
+            self._stores[library] = store
+        return store
+
+    def warm(self):
+        """Runs one query against every non-empty collection so its index is loaded."""
+        for library in self.libraries:
+            collection = self.store(library)._collection
+            sample = collection.get(limit=1, include=["embeddings"])
+            if not sample["ids"]:
+                continue
+            collection.query(query_embeddings=[sample["embeddings"][0]], n_results=1, include=[])
@@ -0,0 +1,220 @@
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Optional
+
+
+_TOKEN = re.compile(r"\w+")
+
+RRF_K = 60
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring over a Chroma collection's chunks.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, dict[str, int]] = {}
+        self.doc_lengths: dict[str, int] = {}
+        self.metadatas: dict[str, dict] = {}
+        self.avg_length = 0.0
+        self._lock = threading.Lock()
+
+    def build(self, ids: list[str], documents: list[str], metadatas: list[dict]):
+        """Builds a new index and swaps it in whole, so searches on other threads see the old or the new one."""
+        postings: dict[str, dict[str, int]] = defaultdict(dict)
+        doc_lengths: dict[str, int] = {}
+        doc_metadatas: dict[str, dict] = {}
+        for doc_id, document, metadata in zip(ids, documents, metadatas):
+            terms = Counter(tokenize(document or ""))
+            for term, count in terms.items():
+                postings[term][doc_id] = count
+            doc_lengths[doc_id] = sum(terms.values())
+            doc_metadatas[doc_id] = metadata or {}
+        avg_length = sum(doc_lengths.values()) / len(doc_lengths) if doc_lengths else 0.0
+        with self._lock:
+            self.postings, self.doc_lengths, self.metadatas, self.avg_length = (
+                dict(postings), doc_lengths, doc_metadatas, avg_length
+            )
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def search(self, query: str, k: int, where: Optional[dict] = None) -> list[tuple[str, float]]:
+        """Returns up to `k` (id, score) pairs, best first, whose metadata matches `where`."""
+        with self._lock:
+            index_postings, doc_lengths, metadatas, avg_length = (
+                self.postings, self.doc_lengths, self.metadatas, self.avg_length
+            )
+        scores: dict[str, float] = defaultdict(float)
+        total = len(doc_lengths)
+        for term in set(tokenize(query)):
+            postings = index_postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                if where and any(metadatas[doc_id].get(key) != value for key, value in where.items()):
+                    continue
+                length_norm = 1 - self.b + self.b * doc_lengths[doc_id] / (avg_length or 1)
+                scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def _cosine(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def reciprocal_rank_fusion(*rankings: list[str]) -> dict[str, float]:
+    scores: dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1 / (RRF_K + rank + 1)
+    return scores
+
+
+def mmr(
+    candidates: list[str], relevance: dict[str, float], embeddings: dict, k: int, lambda_mult: float,
+    duplicate_threshold: float = 0.95,
+) -> list[str]:
+    """
+    Maximal marginal relevance: trades relevance against similarity to chunks already picked.
+
+    Candidates at least `duplicate_threshold` similar to a picked chunk are
+    dropped outright, since the relevance term alone can outweigh the
+    penalty for an exact duplicate. Fewer than `k` chunks may be returned.
+    """
+    def redundancy(doc_id):
+        return max(
+            (_cosine(embeddings[doc_id], embeddings[other]) for other in selected if doc_id in embeddings and other in embeddings),
+            default=0.0,
+        )
+
+    selected: list[str] = []
+    remaining = list(candidates)
+    while remaining and len(selected) < k:
+        scored = {doc_id: redundancy(doc_id) for doc_id in remaining}
+        remaining = [doc_id for doc_id in remaining if scored[doc_id] < duplicate_threshold]
+        if not remaining:
+            break
+        best = max(remaining, key=lambda doc_id: lambda_mult * relevance[doc_id] - (1 - lambda_mult) * scored[doc_id])
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+
+def chroma_where(where: Optional[dict]) -> Optional[dict]:
+    """Chroma needs an explicit $and to match on more than one metadata field."""
+    if not where:
+        return None
+    if len(where) == 1:
+        return dict(where)
+    return {"$and": [{key: value} for key, value in where.items()]}
+
+
+class HybridRetriever:
+    """
+    BM25 plus vector search over one Chroma collection.
+
+    Both rankings are merged with reciprocal-rank fusion, near-duplicate
+    chunks are dropped with MMR, and every selected chunk is returned with
+    its scores. The BM25 index is built from the collection's stored chunks
+    and rebuilt whenever the collection's size changes or, when
+    `manifest_path` is given, the ingest manifest is rewritten, which also
+    catches re-ingested pages that kept their chunk count. Methods block and
+    should be called off the event loop.
+    """
+
+    def __init__(
+        self, vector_store, fetch_factor: int = 4, mmr_lambda: float = 0.7,
+        duplicate_threshold: float = 0.95, manifest_path: Optional[str] = None,
+    ):
+        self.vector_store = vector_store
+        self.fetch_factor = fetch_factor
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+        self.manifest_path = manifest_path
+        self.bm25 = BM25Index()
+        self._indexed_version = None
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        return self.vector_store._collection
+
+    def _version(self) -> tuple:
+        manifest_mtime = None
+        if self.manifest_path:
+            try:
+                manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+            except FileNotFoundError:
+                pass
+        return self.collection.count(), manifest_mtime
+
+    def refresh(self):
+        with self._lock:
+            version = self._version()
+            if version == self._indexed_version:
+                return
+            data = self.collection.get(include=["documents", "metadatas"])
+            self.bm25.build(data["ids"], data["documents"], data["metadatas"])
+            self._indexed_version = version
+
+    def search(self, query: str, query_embedding: list[float], k: int = 3, where: Optional[dict] = None) -> list[dict]:
+        self.refresh()
+        fetch_k = max(k * self.fetch_factor, k)
+
+        vector_hits = self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=fetch_k,
+            where=chroma_where(where),
+            include=["documents", "metadatas", "embeddings", "distances"],
+        )
+        vector_ids = vector_hits["ids"][0]
+        distances = dict(zip(vector_ids, vector_hits["distances"][0]))
+        documents = dict(zip(vector_ids, vector_hits["documents"][0]))
+        metadatas = dict(zip(vector_ids, vector_hits["metadatas"][0]))
+        embeddings = dict(zip(vector_ids, vector_hits["embeddings"][0]))
+
+        bm25_hits = self.bm25.search(query, fetch_k, where)
+        bm25_scores = dict(bm25_hits)
+
+        fused = reciprocal_rank_fusion(vector_ids, [doc_id for doc_id, _ in bm25_hits])
+        candidates = sorted(fused, key=fused.get, reverse=True)[:fetch_k]
+        if not candidates:
+            return []
+
+        # Keyword-only hits were not returned by the vector query; load them
+        missing = [doc_id for doc_id in candidates if doc_id not in documents]
+        if missing:
+            extra = self.collection.get(ids=missing, include=["documents", "metadatas", "embeddings"])
+            documents.update(zip(extra["ids"], extra["documents"]))
+            metadatas.update(zip(extra["ids"], extra["metadatas"]))
+            embeddings.update(zip(extra["ids"], extra["embeddings"]))
+
+        top = fused[candidates[0]]
+        relevance = {doc_id: fused[doc_id] / top for doc_id in candidates}
+        selected = mmr(candidates, relevance, embeddings, k, self.mmr_lambda, self.duplicate_threshold)
+
+        return [
+            {
+                "id": doc_id,
+                "content": documents.get(doc_id),
+                "metadata": metadatas.get(doc_id) or {},
+                "score": round(fused[doc_id], 6),
+                "vector_distance": distances.get(doc_id),
+                "bm25_score": bm25_scores.get(doc_id),
+            }
+            for doc_id in selected
+        ]
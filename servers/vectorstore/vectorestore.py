@@ -1,22 +1,17 @@
-from langchain_chroma import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import WebBaseLoader
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 from dotenv import load_dotenv
+import argparse
+import hashlib
+import json
 import os
 
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'), override=True)
 
-
-embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
-
-current_file_path = os.path.abspath(__file__)
-current_directory = os.path.dirname(current_file_path)
-embeddings_persistent_directory= os.path.join(current_directory, "vectors\\")
-
-os.makedirs(os.path.dirname(embeddings_persistent_directory), exist_ok=True)
+from registry import MANIFEST_PATH, VectorStoreRegistry, collection_name
 
 text_splitter = RecursiveCharacterTextSplitter(
     chunk_size=1000,
@@ -24,30 +19,117 @@ text_splitter = RecursiveCharacterTextSplitter(
     length_function=len
 )
 
-collectionName="aks_networking"
+manifest_path = MANIFEST_PATH
+
+# Pages ingested per library when no --url is given
+library_urls = {
+    "azure_aks": ["https://learn.microsoft.com/en-us/azure/aks/concepts-network-isolated","https://learn.microsoft.com/en-us/azure/aks/core-aks-concepts","https://learn.microsoft.com/en-us/azure/aks/free-standard-pricing-tiers","https://learn.microsoft.com/en-us/azure/aks/upgrade","https://learn.microsoft.com/en-us/azure/backup/azure-kubernetes-service-backup-overview?toc=%2Fazure%2Faks%2Ftoc.json&bc=%2Fazure%2Faks%2Fbreadcrumb%2Ftoc.json","https://learn.microsoft.com/en-us/azure/aks/node-resource-reservations","https://learn.microsoft.com/en-us/azure/aks/aks-communication-manager"],
+}
+
+
+def load_manifest() -> dict:
+    """
+    Reads ingestion progress.
+
+    The manifest maps each library to its URLs, and each URL to the content
+    hash and chunk IDs of its last completed ingest. A URL is only written
+    once all of its chunks are stored. Every run still fetches every URL,
+    so changed pages are noticed, but pages whose hash matches the manifest
+    are not re-embedded. After an interrupted run, only the pages that were
+    not finished are embedded again.
+    """
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict):
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def content_hash(docs) -> str:
+    digest = hashlib.sha256()
+    for doc in docs:
+        digest.update(doc.page_content.encode("utf-8"))
+    return digest.hexdigest()
 
-vector_store = Chroma(
-    collection_name=collectionName,
-    embedding_function=embeddings,
-    persist_directory=f"{embeddings_persistent_directory}\\chroma_langchain_db"
-)
 
-def upload_website_to_collection(url:str):
+def chunk_id(url: str, index: int) -> str:
+    """Stable ID per (url, chunk position) so re-ingesting a page upserts in place."""
+    return f"{hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]}-{index:05d}"
+
+
+def load_website(url: str):
     loader = WebBaseLoader(url)
-    docs = loader.load()
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=20)
+    return loader.load()
+
+
+def upload_website_to_collection(vector_store, library: str, url: str, docs, page_hash: str, previous: dict | None, batch_size: int):
     docs_split = text_splitter.split_documents(docs)
-    for doc in docs_split:
-        doc.metadata = {"source_url": url}
+    ids = []
+    for index, doc in enumerate(docs_split):
+        doc.metadata = {
+            **doc.metadata,
+            "source_url": url,
+            "library": library,
+            "content_hash": page_hash,
+            "chunk_index": index,
+        }
+        ids.append(chunk_id(url, index))
+
+    for start in range(0, len(docs_split), batch_size):
+        vector_store.add_documents(docs_split[start:start + batch_size], ids=ids[start:start + batch_size])
+
+    # The page shrank: drop chunks past the new end
+    stale_ids = sorted(set(previous.get("chunk_ids", []) if previous else []) - set(ids))
+    if stale_ids:
+        vector_store.delete(ids=stale_ids)
+
+    return ids
+
+
+def ingest(library: str, urls: list[str], batch_size: int = 64, concurrency: int = 8, force: bool = False):
+    vector_store = VectorStoreRegistry([library]).store(library)
+    manifest = load_manifest()
+    library_manifest = manifest.setdefault(library, {})
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(load_website, url): url for url in urls}
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                docs = future.result()
+            except Exception as e:
+                print(f"❌ Failed to load {url}: {e}")
+                continue
+
+            page_hash = content_hash(docs)
+            previous = library_manifest.get(url)
+            if not force and previous and previous.get("content_hash") == page_hash:
+                print(f"Skipping unchanged {url}")
+                continue
+
+            ids = upload_website_to_collection(vector_store, library, url, docs, page_hash, previous, batch_size)
+            library_manifest[url] = {"content_hash": page_hash, "chunk_ids": ids}
+            save_manifest(manifest)
+            print(f"Successfully uploaded {len(ids)} documents to collection {collection_name(library)} from {url}")
 
-    vector_store.add_documents(docs_split)
-    return f"Successfully uploaded {len(docs_split)} documents to collection {collectionName} from {url}"
 
-chroma_db_file_path = f"{embeddings_persistent_directory}\\chroma_langchain_db"
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest documentation pages into a library's collection")
+    parser.add_argument("--library", default="azure_aks", help="library whose collection the pages go into")
+    parser.add_argument("--url", action="append", dest="urls", help="page to ingest; defaults to the library's page list")
+    parser.add_argument("--batch-size", type=int, default=64, help="chunks per embedding call")
+    parser.add_argument("--concurrency", type=int, default=8, help="pages fetched in parallel")
+    parser.add_argument("--force", action="store_true", help="re-embed pages even when unchanged")
+    args = parser.parse_args()
 
-urls=["https://learn.microsoft.com/en-us/azure/aks/concepts-network-isolated","https://learn.microsoft.com/en-us/azure/aks/core-aks-concepts","https://learn.microsoft.com/en-us/azure/aks/free-standard-pricing-tiers","https://learn.microsoft.com/en-us/azure/aks/upgrade","https://learn.microsoft.com/en-us/azure/backup/azure-kubernetes-service-backup-overview?toc=%2Fazure%2Faks%2Ftoc.json&bc=%2Fazure%2Faks%2Fbreadcrumb%2Ftoc.json","https://learn.microsoft.com/en-us/azure/aks/node-resource-reservations","https://learn.microsoft.com/en-us/azure/aks/aks-communication-manager"]
+    urls = args.urls or library_urls.get(args.library)
+    if not urls:
+        parser.error(f"No pages listed for library {args.library}; pass them with --url")
 
-if os.path.exists(chroma_db_file_path):
-    for url in urls:
-        response = upload_website_to_collection(url)
-        print(response)
\ No newline at end of file
+    ingest(args.library, urls, batch_size=args.batch_size, concurrency=args.concurrency, force=args.force)
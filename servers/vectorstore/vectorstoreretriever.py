@@ -1,26 +1,11 @@
-import chromadb
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+import argparse
 import os
-from langchain_chroma import Chroma
 
-current_file_path = os.path.abspath(__file__)
-current_directory = os.path.dirname(current_file_path)
-embeddings_persistent_directory= os.path.join(current_directory, "vectors\\")
-persist_directory = embeddings_persistent_directory
-client = chromadb.PersistentClient(path=persist_directory)
+from dotenv import load_dotenv
 
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'), override=True)
 
-
-embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
-
-collectionName="aks_networking"
-
-
-vector_store = Chroma(
-    collection_name=collectionName,
-    embedding_function=embeddings,
-    persist_directory=f"{embeddings_persistent_directory}\\chroma_langchain_db",
-)
+from registry import VectorStoreRegistry, get_embeddings
 
 
 def search_with_query(query, vector_store, embeddings, k=3):
@@ -30,8 +15,14 @@ def search_with_query(query, vector_store, embeddings, k=3):
     return results
 
 
-results = vector_store.similarity_search_by_vector(
-    embedding=embeddings.embed_query("what is azure CNI?"), k=3
-)
-for doc in results:
-    print(f"* {doc.page_content} [{doc.metadata}]")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query a library's vector store collection")
+    parser.add_argument("query", nargs="?", default="what is azure CNI?")
+    parser.add_argument("--library", default="azure_aks")
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    embeddings = get_embeddings()
+    vector_store = VectorStoreRegistry([args.library], embeddings).store(args.library)
+    for doc in search_with_query(args.query, vector_store, embeddings, k=args.k):
+        print(f"* {doc.page_content} [{doc.metadata}]")